@@ -1,14 +1,25 @@
 import json
-import google.generativeai as genai
-from typing import Dict, List, Tuple, Optional
-import os
-from dataclasses import dataclass
-import time
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional, Union
+from dataclasses import dataclass, replace
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import itertools
+import threading
+from rate_limiter import RateLimiter, call_with_retries
+from llm_cache import LLMCache
+from checkpoint import CheckpointWriter
+from backends import GeminiBackend, LLMBackend
+from keyword_scanner import KeywordScanner
+from user_context import UserContext, source_user_key
+from token_budget import POST_SELECTION_STRATEGIES, estimate_tokens
+from extractor_dag import ExtractorDAG, ExtractorNode
+from metrics import Metrics, timed_extractor
+from interest_classifier import InterestClassifier
 #from db import Database
 
 # db = Database(host="", user="", password="", db="")
 
-@dataclass
+@dataclass(slots=True)
 class UserProfile:
     first_name: str
     last_name: str
@@ -27,19 +38,204 @@ class UserProfile:
     travel_frequency: str
     life_indicators: List[str]
     spending_indicators: List[str]
+    fingerprint: str = ""
+    user_key: str = ""
+
+PROFILE_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "top_interests": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "interest": {"type": "STRING"},
+                    "percentage": {"type": "INTEGER"}
+                },
+                "required": ["interest", "percentage"]
+            }
+        },
+        "personality_summary": {"type": "STRING"},
+        "key_activities": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "top_habits": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "top_hobby": {"type": "STRING"},
+        "spending_indicators": {"type": "ARRAY", "items": {"type": "STRING"}}
+    },
+    "required": [
+        "top_interests", "personality_summary", "key_activities",
+        "top_habits", "top_hobby", "spending_indicators"
+    ]
+}
+
+# Field list shared by the single-user and batched structured prompts; the
+# indentation matches the prompts it is pasted into
+STRUCTURED_FIELD_INSTRUCTIONS = """1. top_interests: the 3 most prominent interests from the available categories,
+           each with a whole-number percentage; percentages must sum to 100
+        2. personality_summary: a 2-3 sentence summary in English focusing on
+           professional and personal traits, highlighting cultural aspects if relevant
+        3. key_activities: up to 5 concrete activities/experiences from the posts (10-50 words each)
+        4. top_habits: the 2 most frequent habits, in specific English terms
+        5. top_hobby: the single most prominent hobby
+        6. spending_indicators: 2 spending indicators (primary expenditure category and
+           secondary spending pattern, with frequency descriptors when possible)"""
+
+def profile_to_dict(profile: UserProfile) -> Dict:
+    """Serialize a profile in the output-file layout"""
+    return {
+        'first_name': profile.first_name,
+        'last_name': profile.last_name,
+        'age': profile.age,
+        'gender': profile.gender,
+        'marital_status': profile.marital_status,
+        'education': profile.education,
+        'job': profile.job,
+        'location': profile.location,
+        'top_interests': profile.top_interests,
+        'personality_summary': profile.personality_summary,
+        'key_activities': profile.key_activities,
+        'total_posts': profile.total_posts,
+        'top_habits': profile.top_habits,
+        'top_hobby': profile.top_hobby,
+        'travel_indicators': profile.travel_frequency,
+        'life_indicators': profile.life_indicators,
+        'spending_indicators': profile.spending_indicators,
+        'fingerprint': profile.fingerprint,
+        'user_key': profile.user_key
+    }
+
+def profile_from_dict(data: Dict) -> UserProfile:
+    """Rebuild a profile from its output-file layout"""
+    return UserProfile(
+        first_name=data['first_name'],
+        last_name=data['last_name'],
+        age=data.get('age', 'Unknown'),
+        gender=data.get('gender', 'Unknown'),
+        marital_status=data.get('marital_status', 'Unknown'),
+        education=data.get('education', 'Unknown'),
+        job=data.get('job', 'Unknown'),
+        location=data.get('location', 'Unknown'),
+        top_interests=data.get('top_interests', []),
+        personality_summary=data.get('personality_summary', ''),
+        key_activities=data.get('key_activities', []),
+        total_posts=data.get('total_posts', 0),
+        top_habits=data.get('top_habits', []),
+        top_hobby=data.get('top_hobby', ''),
+        travel_frequency=data.get('travel_indicators', ''),
+        life_indicators=data.get('life_indicators', []),
+        spending_indicators=data.get('spending_indicators', []),
+        fingerprint=data.get('fingerprint', ''),
+        user_key=data.get('user_key', '')
+    )
+
+def read_users(file_path: str, chunk_size: int = 1 << 16) -> Iterator[Dict]:
+    """Incrementally decode user objects from a JSON array, JSONL file or
+    comma-separated objects, holding at most a few chunks in memory"""
+    decoder = json.JSONDecoder()
+    separators = ' \t\r\n,[]\ufeff'
+    with open(file_path, 'r', encoding='utf-8') as file:
+        buffer = ''
+        eof = False
+        read_size = chunk_size
+        while True:
+            buffer = buffer.lstrip(separators)
+            if not buffer:
+                if eof:
+                    return
+                chunk = file.read(read_size)
+                eof = not chunk
+                buffer = chunk
+                continue
+            try:
+                user, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = file.read(read_size)
+                eof = not chunk
+                buffer += chunk
+                # Grow reads for objects larger than one chunk to avoid re-decoding too often
+                read_size *= 2
+                continue
+            read_size = chunk_size
+            buffer = buffer[end:]
+            if isinstance(user, dict):
+                yield user
+
+BATCH_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "profiles": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "user_key": {"type": "STRING"},
+                    **PROFILE_RESPONSE_SCHEMA["properties"]
+                },
+                "required": ["user_key"] + PROFILE_RESPONSE_SCHEMA["required"]
+            }
+        }
+    },
+    "required": ["profiles"]
+}
 
 class LLMUserProfileAnalyzer:
-    def __init__(self, api_key: str = None):
-        """Initialize the LLM-based analyzer with Gemini Flash"""
-        if api_key:
-            genai.configure(api_key=api_key)
-        else:
-            api_key = os.getenv('GEMINI_API_KEY')
-            if not api_key:
-                raise ValueError("Please provide a Gemini API key either as parameter or set GEMINI_API_KEY environment variable")
-            genai.configure(api_key=api_key)
-        
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+    def __init__(self, api_key: str = None, structured_output: bool = False,
+                 max_workers: int = 1, max_concurrent_calls: Optional[int] = None,
+                 requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 rate_limiter: Optional[RateLimiter] = None, max_retries: int = 3,
+                 cache: Optional[LLMCache] = None, batch_token_budget: Optional[int] = None,
+                 max_batch_users: int = 8, backend: Optional[LLMBackend] = None,
+                 extractor_workers: int = 4, prompt_token_budget: Optional[int] = None,
+                 post_selection: str = 'recent', metrics: Optional[Metrics] = None,
+                 interest_confidence_threshold: Optional[float] = 0.7):
+        """Initialize the LLM-based analyzer with Gemini Flash
+
+        Any LLMBackend (e.g. backends.OfflineBackend for offline runs) may be
+        passed as backend instead; api_key is only used for the default Gemini one.
+
+        With structured_output=True the LLM fields of a profile are requested
+        in a single schema-constrained JSON call instead of one call per field.
+        max_workers is the number of users analyzed concurrently by
+        analyze_all_users and extractor_workers the number of independent
+        extractors run concurrently per user; max_concurrent_calls caps
+        in-flight model calls (defaults to max_workers * extractor_workers).
+        Model calls are throttled by a shared RateLimiter (pass rate_limiter to
+        share one between analyzers, or requests/tokens per minute to build one)
+        and retried up to max_retries times with jittered exponential backoff.
+        An optional LLMCache serves repeated prompts from disk.
+        With batch_token_budget set, consecutive low-volume users are packed
+        (up to max_batch_users) into one structured request of at most that
+        many estimated prompt tokens.
+        prompt_token_budget caps the estimated tokens of posts pasted into any
+        single prompt; users over it get a deterministic subset of posts chosen
+        by post_selection ('recent', 'keyword_dense' or 'stratified').
+        Model calls, cache lookups, extractor timings and fallbacks are recorded
+        in metrics (a fresh Metrics unless one is passed in).
+        Top interests come from the local InterestClassifier when its confidence
+        reaches interest_confidence_threshold; the LLM is asked only below it
+        (None always asks the LLM).
+        """
+        if post_selection not in POST_SELECTION_STRATEGIES:
+            raise ValueError(f"post_selection must be one of {POST_SELECTION_STRATEGIES}")
+        self.model = backend or GeminiBackend(api_key)
+        self.model_name = self.model.model_name
+        self.structured_output = structured_output
+        self.max_workers = max(1, max_workers)
+        self.extractor_workers = max(1, extractor_workers)
+        self._call_slots = threading.BoundedSemaphore(
+            max(1, max_concurrent_calls or self.max_workers * self.extractor_workers))
+        self._extractor_pool = None
+        self._extractor_pool_lock = threading.Lock()
+        self.rate_limiter = rate_limiter or RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_retries = max_retries
+        self.cache = cache
+        self.batch_token_budget = batch_token_budget
+        self.max_batch_users = max(1, max_batch_users)
+        self.prompt_token_budget = prompt_token_budget
+        self.post_selection = post_selection
+        self.metrics = metrics or Metrics()
+        self.interest_confidence_threshold = interest_confidence_threshold
         
         self.interest_categories = [
             "technology", "education", "fashion", "food", "sports", "traveling",
@@ -48,6 +244,92 @@ class LLMUserProfileAnalyzer:
             "cooking", "nature", "science", "business", "politics", "religion",
             "volunteer work", "family", "social activities"
         ]
+
+        self.travel_keywords = [
+            'travel', 'trip', 'visit', 'go to', 'vacation',
+            'journey', 'tour', 'destination', 'flight', 'hotel'
+        ]
+        self.lifestyle_patterns = {
+            'morning': ['morning', 'wake up', 'breakfast'],
+            'evening': ['evening', 'night', 'dinner'],
+            'work': ['work', 'job', 'office', 'career'],
+            'fitness': ['exercise', 'gym', 'yoga', 'run'],
+            'social': ['friend', 'family', 'social', 'meet'],
+            'leisure': ['read', 'movie', 'game', 'hobby'],
+            'health': ['health', 'sleep', 'meal', 'diet']
+        }
+        self.spending_categories = {
+            'professional': ['buy', 'purchase', 'tool', 'equipment', 'conference'],
+            'leisure': ['dine', 'movie', 'concert', 'hobby', 'game'],
+            'education': ['course', 'book', 'learn', 'class', 'workshop'],
+            'travel': ['trip', 'hotel', 'flight', 'vacation', 'resort']
+        }
+        self.interest_classifier = InterestClassifier(self.interest_categories)
+        self.keyword_scanner = KeywordScanner({
+            'travel': {kw: [kw] for kw in self.travel_keywords},
+            'lifestyle': self.lifestyle_patterns,
+            'spending': self.spending_categories
+        })
+
+        self.extractor_dag = ExtractorDAG([
+            ExtractorNode('interests', lambda ctx, _: self.extract_top_interests(ctx),
+                          outputs=('top_interests',)),
+            ExtractorNode('summary', lambda ctx, _: self.generate_personality_summary(ctx),
+                          outputs=('personality_summary',)),
+            ExtractorNode('activities', lambda ctx, _: self.extract_key_activities(ctx),
+                          outputs=('key_activities',)),
+            ExtractorNode('habits', lambda ctx, _: self.extract_habits_hobbies(ctx),
+                          outputs=('top_habits', 'top_hobby')),
+            *self._heuristic_nodes()
+        ])
+        self.structured_dag = ExtractorDAG([
+            ExtractorNode('structured', lambda ctx, _: self.extract_structured_profile(ctx),
+                          outputs=('structured',)),
+            ExtractorNode('structured_fields', self._unpack_structured, inputs=('structured',),
+                          outputs=('top_interests', 'personality_summary', 'key_activities',
+                                   'top_habits', 'top_hobby')),
+            *self._heuristic_nodes(structured=True)
+        ])
+
+    def _heuristic_nodes(self, structured: bool = False) -> List[ExtractorNode]:
+        """Travel, life and spending nodes shared by both extractor DAGs"""
+        def spending(ctx, inputs):
+            fields = inputs.get('structured')
+            if fields and len(fields['spending_indicators']) == 2:
+                return fields['spending_indicators']
+            return self.extract_spending_indicators(ctx, inputs)
+
+        return [
+            ExtractorNode('travel', lambda ctx, _: self.extract_travel_frequency(ctx),
+                          outputs=('travel_frequency',)),
+            ExtractorNode('life', lambda ctx, inputs: self.extract_life_indicators(ctx, inputs),
+                          inputs=('key_activities', 'top_habits', 'top_hobby', 'top_interests'),
+                          outputs=('life_indicators',)),
+            ExtractorNode('spending', spending,
+                          inputs=('key_activities', 'top_habits') + (('structured',) if structured else ()),
+                          outputs=('spending_indicators',))
+        ]
+
+    def _unpack_structured(self, context: UserContext, inputs: Dict) -> Tuple:
+        """LLM fields from a structured response, or from the per-field extractors if it failed"""
+        structured = inputs['structured']
+        if structured:
+            return (structured['top_interests'], structured['personality_summary'],
+                    structured['key_activities'], structured['top_habits'], structured['top_hobby'])
+        top_habits, top_hobby = self.extract_habits_hobbies(context)
+        return (self.extract_top_interests(context), self.generate_personality_summary(context),
+                self.extract_key_activities(context), top_habits, top_hobby)
+
+    def _get_extractor_pool(self) -> Optional[ThreadPoolExecutor]:
+        """Shared pool running independent extractors (None when extractors run serially)"""
+        if self.extractor_workers == 1:
+            return None
+        with self._extractor_pool_lock:
+            if self._extractor_pool is None:
+                self._extractor_pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers * self.extractor_workers,
+                    thread_name_prefix='extractor')
+            return self._extractor_pool
     
     def extract_name_parts(self, UserName: str) -> Tuple[str, str]:
         """Extract first name and last name from full name (handles Arabic and English)"""
@@ -63,18 +345,24 @@ class LLMUserProfileAnalyzer:
             last_name = ""
         return first_name, last_name
     
+    def iter_users_from_file(self, file_path: str) -> Iterator[Dict]:
+        """Lazily yield users from a JSON array or JSONL file with bounded memory
+
+        A parse error is re-raised after the users read before it, so callers
+        never mistake a truncated read for the whole file.
+        """
+        try:
+            yield from read_users(file_path)
+        except FileNotFoundError:
+            print(f"Error: File '{file_path}' not found!")
+        except json.JSONDecodeError as e:
+            print(f"Error parsing JSON: {e}")
+            raise
+
     def load_users_from_file(self, file_path: str) -> List[Dict]:
         """Load users data from JSON file"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-                if not content.strip().startswith('['):
-                    content = '[' + content
-                if not content.strip().endswith(']'):
-                    content = content + ']'
-                
-                users = json.loads(content)
-                return users
+            return list(read_users(file_path))
         except FileNotFoundError:
             print(f"Error: File '{file_path}' not found!")
             return []
@@ -82,6 +370,46 @@ class LLMUserProfileAnalyzer:
             print(f"Error parsing JSON: {e}")
             return []
     
+    def _generate(self, prompt: str, generation_config: Optional[Dict] = None) -> str:
+        """Send a prompt to the model and return the response text
+
+        Served from the response cache when possible; otherwise throttled by
+        the rate limiter and retried on 429/transient errors, so extractors
+        only fall back once the retries are exhausted.
+        """
+        cache_key = None
+        if self.cache is not None:
+            cache_key = LLMCache.make_key(self.model_name, prompt, generation_config)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.metrics.increment('cache_hits_total')
+                return cached
+            self.metrics.increment('cache_misses_total')
+
+        def attempt():
+            self.rate_limiter.acquire(estimate_tokens(prompt))
+            with self._call_slots:
+                self.metrics.increment('model_calls_total', model=self.model_name)
+                with self.metrics.timer('model_call_seconds', model=self.model_name):
+                    response = self.model.generate_content(prompt, generation_config=generation_config)
+            return response.text
+
+        def log_retry(attempt_number: int, error: Exception):
+            self.metrics.increment('model_retries_total', model=self.model_name)
+            print(f"Retrying model call (attempt {attempt_number + 2}/{self.max_retries + 1}): {error}")
+
+        self.metrics.increment('model_prompt_chars_total', len(prompt), model=self.model_name)
+        try:
+            text = call_with_retries(attempt, max_retries=self.max_retries,
+                                     limiter=self.rate_limiter, on_retry=log_retry)
+        except Exception:
+            self.metrics.increment('model_errors_total', model=self.model_name)
+            raise
+        self.metrics.increment('model_response_chars_total', len(text or ""), model=self.model_name)
+        if cache_key is not None:
+            self.cache.put(cache_key, self.model_name, text)
+        return text
+
     def safe_parse_json(self, text: str, default=None):
         """Safely parse JSON with fallback to default value"""
         try:
@@ -91,12 +419,33 @@ class LLMUserProfileAnalyzer:
         except Exception:
             return default
     
-    def extract_top_interests(self, user_data: Dict) -> List[Dict[str, float]]:
-        """Extract top 3 interests with percentage distribution"""
-        posts_text = ' '.join(user_data.get('Posts', []))
+    def build_context(self, user_data: Union[Dict, UserContext],
+                      keyword_counts: Optional[Dict[str, Dict[str, int]]] = None) -> UserContext:
+        """Per-user analysis context shared by the extractors (passed through if already built)"""
+        if isinstance(user_data, UserContext):
+            return user_data
+        return UserContext(user_data, self.keyword_scanner,
+                           self.prompt_token_budget, self.post_selection, keyword_counts)
+
+    @timed_extractor
+    def extract_top_interests(self, user_data: Union[Dict, UserContext]) -> List[Dict[str, float]]:
+        """Extract top 3 interests with percentage distribution
+
+        Confident local classifications are returned without a model call.
+        """
+        user_data = self.build_context(user_data)
+        posts_text = user_data.prompt_posts_text
         job = user_data.get('Job', '')
         education = user_data.get('Education', '')
 
+        local_interests, confidence = self.interest_classifier.classify(
+            user_data.posts_text_lower, str(job or ''), str(education or ''))
+        if (self.interest_confidence_threshold is not None
+                and confidence >= self.interest_confidence_threshold):
+            self.metrics.increment('interest_classifications_total', source='local')
+            return local_interests
+        self.metrics.increment('interest_classifications_total', source='llm')
+
         prompt = f"""
         Analyze the following user profile and extract the top 3 most prominent interests/hobbies with percentage distribution:
         The content may be in English, Arabic, or mixed.
@@ -123,9 +472,9 @@ class LLMUserProfileAnalyzer:
         art,50,technology,30,business,20
         """
         
+        fallback_reason = 'default'
         try:
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
+            response_text = self._generate(prompt).strip()
             
             
             response_text = response_text.replace('```json', '').replace('```', '').strip()
@@ -164,40 +513,50 @@ class LLMUserProfileAnalyzer:
                         return interests
                 except (ValueError, IndexError):
                     pass
-            
-            found_interests = []
-            for interest in self.interest_categories:
-                if (interest.lower() in posts_text.lower() or 
-                    interest.lower() in job.lower() or 
-                    interest.lower() in education.lower()):
-                    found_interests.append(interest)
-                    if len(found_interests) >= 3:
-                        break
-            
-            if found_interests:
-                base_pct = 100 // len(found_interests)
-                interests = []
-                for i, interest in enumerate(found_interests):
-                    if i == len(found_interests) - 1:
-                        pct = 100 - (base_pct * (len(found_interests) - 1))
-                    else:
-                        pct = base_pct
-                    interests.append({'interest': interest, 'percentage': pct})
-                return interests
-            
+
         except Exception as e:
             print(f"Error extracting interests: {e}")
+            fallback_reason = 'error'
+
+        # Local fallbacks also cover model errors, after the retries are exhausted
+        if len(local_interests) == 3:
+            self.metrics.increment('extractor_fallbacks_total', extractor='extract_top_interests', reason='classifier')
+            return local_interests
+        
+        found_interests = []
+        for interest in self.interest_categories:
+            if (interest.lower() in user_data.posts_text_lower or 
+                interest.lower() in job.lower() or 
+                interest.lower() in education.lower()):
+                found_interests.append(interest)
+                if len(found_interests) >= 3:
+                    break
         
+        if found_interests:
+            base_pct = 100 // len(found_interests)
+            interests = []
+            for i, interest in enumerate(found_interests):
+                if i == len(found_interests) - 1:
+                    pct = 100 - (base_pct * (len(found_interests) - 1))
+                else:
+                    pct = base_pct
+                interests.append({'interest': interest, 'percentage': pct})
+            self.metrics.increment('extractor_fallbacks_total', extractor='extract_top_interests', reason='keyword_scan')
+            return interests
 
+        # Counted once, as 'error' when the model call failed
+        self.metrics.increment('extractor_fallbacks_total', extractor='extract_top_interests', reason=fallback_reason)
         return [
             {"interest": "art", "percentage": 34},
             {"interest": "technology", "percentage": 33},
             {"interest": "business", "percentage": 33}
         ]
 
-    def generate_personality_summary(self, user_data: Dict) -> str:
+    @timed_extractor
+    def generate_personality_summary(self, user_data: Union[Dict, UserContext]) -> str:
         """Generate personality summary (handles Arabic content)"""
-        posts_text = ' '.join(user_data.get('Posts', []))
+        user_data = self.build_context(user_data)
+        posts_text = user_data.prompt_posts_text
         job = user_data.get('Job', '')
         education = user_data.get('Education', '')
         age = user_data.get('Age', '')
@@ -225,15 +584,17 @@ class LLMUserProfileAnalyzer:
         """
         
         try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
+            return self._generate(prompt).strip()
         except Exception as e:
             print(f"Error generating personality summary: {e}")
+            self.metrics.increment('extractor_fallbacks_total', extractor='generate_personality_summary', reason='error')
             return "Shows a balanced personality with diverse interests."
     
-    def extract_key_activities(self, user_data: Dict) -> List[str]:
+    @timed_extractor
+    def extract_key_activities(self, user_data: Union[Dict, UserContext]) -> List[str]:
         """Use LLM to extract key activities from posts"""
-        posts_text = ' '.join(user_data.get('Posts', []))
+        user_data = self.build_context(user_data)
+        posts_text = user_data.prompt_posts_text
         
         if not posts_text.strip():
             return []
@@ -262,9 +623,9 @@ class LLMUserProfileAnalyzer:
         """
         
         try:
-            response = self.model.generate_content(prompt)
+            response_text = self._generate(prompt)
             activities = []
-            lines = response.text.strip().split('\n')
+            lines = response_text.strip().split('\n')
             for line in lines:
                 if line.strip() and any(char.isdigit() for char in line[:3]):
                     # Remove numbering and clean up
@@ -274,11 +635,14 @@ class LLMUserProfileAnalyzer:
             return activities[:5]
         except Exception as e:
             print(f"Error extracting activities: {e}")
+            self.metrics.increment('extractor_fallbacks_total', extractor='extract_key_activities', reason='error')
             return []
     
-    def extract_habits_hobbies(self, user_data: Dict) -> Tuple[List[str], str]:
+    @timed_extractor
+    def extract_habits_hobbies(self, user_data: Union[Dict, UserContext]) -> Tuple[List[str], str]:
         """Extract top 2 habits and top 1 hobby from posts"""
-        posts_text = ' '.join(user_data.get('Posts', []))
+        user_data = self.build_context(user_data)
+        posts_text = user_data.prompt_posts_text
         
         prompt = f"""
         Analyze the following posts to identify habits and hobbies:
@@ -300,8 +664,7 @@ class LLMUserProfileAnalyzer:
         """
         
         try:
-            response = self.model.generate_content(prompt)
-            text = response.text.strip()
+            text = self._generate(prompt).strip()
             
             
             habits = []
@@ -320,29 +683,15 @@ class LLMUserProfileAnalyzer:
             return habits, hobby
         except Exception as e:
             print(f"Error extracting habits/hobbies: {e}")
+            self.metrics.increment('extractor_fallbacks_total', extractor='extract_habits_hobbies', reason='error')
             return [], ""
     
-    def extract_travel_frequency(self, user_data: Dict) -> str:
+    @timed_extractor
+    def extract_travel_frequency(self, user_data: Union[Dict, UserContext]) -> str:
         """Determine overall travel frequency classification"""
-        posts = user_data.get('Posts', [])
-        
-        travel_keywords = {
-            'travel': 0,
-            'trip': 0, 
-            'visit': 0,
-            'go to': 0,
-            'vacation': 0,
-            'journey': 0,
-            'tour': 0,
-            'destination': 0,
-            'flight': 0,
-            'hotel': 0
-        }
+        user_data = self.build_context(user_data)
         
-        for post in posts:
-            lower_post = post.lower()
-            for kw in travel_keywords:
-                travel_keywords[kw] += lower_post.count(kw)
+        travel_keywords = user_data.keyword_counts['travel']
         
         total_mentions = sum(travel_keywords.values())
         
@@ -377,44 +726,37 @@ class LLMUserProfileAnalyzer:
         
         return indicators if indicators else ["none"]
 
-    def extract_life_indicators(self, user_data: Dict) -> List[str]:
-        """Extract lifestyle indicators without frequency labels"""
+    @timed_extractor
+    def extract_life_indicators(self, user_data: Union[Dict, UserContext],
+                                upstream: Optional[Dict] = None) -> List[str]:
+        """Extract lifestyle indicators without frequency labels
+
+        upstream holds results of earlier extractors (key_activities,
+        top_habits, top_hobby, top_interests), taking precedence over the user record.
+        """
         
-        posts = user_data.get('Posts', [])
-        key_activities = user_data.get('key_activities', [])
-        top_habits = user_data.get('top_habits', [])
-        top_hobby = user_data.get('top_hobby', '')
+        user_data = self.build_context(user_data)
+        upstream = upstream or {}
+        key_activities = upstream.get('key_activities', user_data.get('key_activities', []))
+        top_habits = upstream.get('top_habits', user_data.get('top_habits', []))
+        top_hobby = upstream.get('top_hobby', user_data.get('top_hobby', ''))
         job = user_data.get('job', '')
-        personality = user_data.get('personality_summary', '')
-        interests = [i['interest'] for i in user_data.get('top_interests', [])[:3]]
-
-        lifestyle_patterns = {
-            'morning': {'keywords': ['morning', 'wake up', 'breakfast'], 'count': 0},
-            'evening': {'keywords': ['evening', 'night', 'dinner'], 'count': 0},
-            'work': {'keywords': ['work', 'job', 'office', 'career'], 'count': 0},
-            'fitness': {'keywords': ['exercise', 'gym', 'yoga', 'run'], 'count': 0},
-            'social': {'keywords': ['friend', 'family', 'social', 'meet'], 'count': 0},
-            'leisure': {'keywords': ['read', 'movie', 'game', 'hobby'], 'count': 0},
-            'health': {'keywords': ['health', 'sleep', 'meal', 'diet'], 'count': 0}
-        }
+        personality = upstream.get('personality_summary', user_data.get('personality_summary', ''))
+        interests = [i['interest'] for i in upstream.get('top_interests', user_data.get('top_interests', []))[:3]]
 
-        for post in posts:
-            lower_post = post.lower()
-            for pattern in lifestyle_patterns.values():
-                pattern['count'] += sum(lower_post.count(kw) for kw in pattern['keywords'])
+        lifestyle_counts = dict(user_data.keyword_counts['lifestyle'])
+        if key_activities:
+            activity_counts = self.keyword_scanner.category_counts(key_activities)['lifestyle']
+            for pattern, count in activity_counts.items():
+                lifestyle_counts[pattern] += count
 
-        for activity in key_activities:
-            lower_act = activity.lower()
-            for pattern in lifestyle_patterns.values():
-                pattern['count'] += sum(lower_act.count(kw) for kw in pattern['keywords'])
-
-        top_patterns = sorted(lifestyle_patterns.items(), 
-                            key=lambda x: x[1]['count'], reverse=True)[:3]
+        top_patterns = sorted(lifestyle_counts.items(), 
+                            key=lambda x: x[1], reverse=True)[:3]
 
 
         indicators = []
-        for pattern, data in top_patterns:
-            if data['count'] > 0:
+        for pattern, count in top_patterns:
+            if count > 0:
                 if pattern == 'morning':
                     indicators.append("Maintains morning routines")
                 elif pattern == 'evening':
@@ -462,27 +804,22 @@ class LLMUserProfileAnalyzer:
         ]
         return general_indicators[index % len(general_indicators)]
 
-    def extract_spending_indicators(self, user_data: Dict) -> List[str]:
-        """Extract spending patterns with financial behavior analysis"""
-        posts = user_data.get('Posts', [])
-        posts_text = ' '.join(posts)
-        key_activities = user_data.get('key_activities', [])
-        top_habits = user_data.get('top_habits', [])
+    @timed_extractor
+    def extract_spending_indicators(self, user_data: Union[Dict, UserContext],
+                                    upstream: Optional[Dict] = None) -> List[str]:
+        """Extract spending patterns with financial behavior analysis
+
+        upstream holds results of earlier extractors (key_activities,
+        top_habits), taking precedence over the user record.
+        """
+        user_data = self.build_context(user_data)
+        upstream = upstream or {}
+        key_activities = upstream.get('key_activities', user_data.get('key_activities', []))
+        top_habits = upstream.get('top_habits', user_data.get('top_habits', []))
         job = user_data.get('job', '')
         
     
-        spending_categories = {
-            'professional': ['buy', 'purchase', 'tool', 'equipment', 'conference'],
-            'leisure': ['dine', 'movie', 'concert', 'hobby', 'game'],
-            'education': ['course', 'book', 'learn', 'class', 'workshop'],
-            'travel': ['trip', 'hotel', 'flight', 'vacation', 'resort']
-        }
-        
-        category_counts = {cat: 0 for cat in spending_categories}
-        for post in posts:
-            lower_post = post.lower()
-            for cat, keywords in spending_categories.items():
-                category_counts[cat] += sum(lower_post.count(kw) for kw in keywords)
+        category_counts = dict(user_data.keyword_counts['spending'])
         
         prompt = f"""
         Analyze spending behaviors from:
@@ -503,10 +840,11 @@ class LLMUserProfileAnalyzer:
         """
         
         try:
-            response = self.model.generate_content(prompt)
-            indicators = self.safe_parse_json(response.text, default=[])
+            response_text = self._generate(prompt)
+            indicators = self.safe_parse_json(response_text, default=[])
             
             if not indicators:
+                self.metrics.increment('extractor_fallbacks_total', extractor='extract_spending_indicators', reason='heuristic')
                 sorted_categories = sorted(category_counts.items(), 
                                         key=lambda x: x[1], reverse=True)
                 
@@ -528,66 +866,466 @@ class LLMUserProfileAnalyzer:
             
         except Exception as e:
             print(f"Error extracting spending indicators: {e}")
+            self.metrics.increment('extractor_fallbacks_total', extractor='extract_spending_indicators', reason='error')
             return [
                 "Discernible spending patterns in posts",
                 "Visible financial behaviors"
             ]
-    def analyze_user_profile(self, user: Dict) -> UserProfile:
-        """Analyze a single user's complete profile using LLM"""
+
+    @timed_extractor
+    def extract_structured_profile(self, user_data: Union[Dict, UserContext]) -> Optional[Dict]:
+        """Extract all LLM profile fields with one schema-constrained JSON request
+
+        Returns None when the response cannot be validated, so the caller can
+        fall back to the per-field extractors.
+        """
+        user_data = self.build_context(user_data)
+        posts_text = user_data.prompt_posts_text
+        job = user_data.get('Job', '')
+        education = user_data.get('Education', '')
+        age = user_data.get('Age', '')
+        marital_status = user_data.get('MaritalStatus', '')
+
+        prompt = f"""
+        Analyze this user profile. The content may be in English, Arabic, or mixed.
+
+        BASIC INFO:
+        - Age: {age}
+        - Job: {job}
+        - Education: {education}
+        - Marital Status: {marital_status}
+
+        POSTS/ACTIVITIES (may contain Arabic):
+        {posts_text}
+
+        Available interest categories:
+        {', '.join(self.interest_categories)}
+
+        Return a JSON object with:
+        {STRUCTURED_FIELD_INSTRUCTIONS}
+        """
+
+        try:
+            response_text = self._generate(
+                prompt,
+                generation_config={
+                    "response_mime_type": "application/json",
+                    "response_schema": PROFILE_RESPONSE_SCHEMA
+                }
+            )
+            data = self.safe_parse_json(response_text)
+            structured = self.validate_structured_profile(data)
+            if structured is None:
+                self.metrics.increment('extractor_fallbacks_total', extractor='extract_structured_profile', reason='invalid')
+            return structured
+        except Exception as e:
+            print(f"Error extracting structured profile: {e}")
+            self.metrics.increment('extractor_fallbacks_total', extractor='extract_structured_profile', reason='error')
+            return None
+
+    def validate_structured_profile(self, data) -> Optional[Dict]:
+        """Validate and normalize a structured profile response, None if unusable"""
+        if not isinstance(data, dict):
+            return None
+
+        interests = []
+        for item in data.get('top_interests') or []:
+            if not isinstance(item, dict):
+                continue
+            interest = str(item.get('interest', '')).strip().lower()
+            try:
+                percentage = int(item.get('percentage'))
+            except (TypeError, ValueError):
+                continue
+            if interest in self.interest_categories and percentage >= 0:
+                interests.append({'interest': interest, 'percentage': percentage})
+        interests = interests[:3]
+        if len(interests) != 3 or sum(item['percentage'] for item in interests) != 100:
+            return None
+
+        def string_list(value, limit):
+            if not isinstance(value, list):
+                return []
+            return [str(v).strip() for v in value if str(v).strip()][:limit]
+
+        summary = data.get('personality_summary')
+        if not isinstance(summary, str) or not summary.strip():
+            return None
+
+        hobby = data.get('top_hobby')
+        return {
+            'top_interests': interests,
+            'personality_summary': summary.strip(),
+            'key_activities': string_list(data.get('key_activities'), 5),
+            'top_habits': string_list(data.get('top_habits'), 2),
+            'top_hobby': hobby.strip() if isinstance(hobby, str) else "",
+            'spending_indicators': string_list(data.get('spending_indicators'), 2)
+        }
+
+    def _format_batch_user(self, user_key: str, user_data: Union[Dict, UserContext]) -> str:
+        """Prompt block describing one user of a packed batch request"""
+        user_data = self.build_context(user_data)
+        posts_text = user_data.prompt_posts_text
+        return f"""
+        USER {user_key}:
+        - Age: {user_data.get('Age', '')}
+        - Job: {user_data.get('Job', '')}
+        - Education: {user_data.get('Education', '')}
+        - Marital Status: {user_data.get('MaritalStatus', '')}
+        POSTS/ACTIVITIES (may contain Arabic):
+        {posts_text}
+        """
+
+    @timed_extractor
+    def extract_structured_profiles_batch(self, users: List[Dict]) -> List[Optional[Dict]]:
+        """Extract structured profile fields for several users with one request
+
+        Returns one validated field dict per user, in order; None marks users
+        missing from, or invalid in, the response (all None if it does not parse).
+        """
+        user_blocks = ''.join(self._format_batch_user(f"u{i}", user) for i, user in enumerate(users))
+
+        prompt = f"""
+        Analyze each of the following {len(users)} user profiles independently.
+        The content may be in English, Arabic, or mixed.
+        {user_blocks}
+        Available interest categories:
+        {', '.join(self.interest_categories)}
+
+        Return a JSON object with a "profiles" array holding one entry per user,
+        with "user_key" set to the user's key (e.g. "u0") and:
+        {STRUCTURED_FIELD_INSTRUCTIONS}
+        """
+
+        results: List[Optional[Dict]] = [None] * len(users)
+        try:
+            response_text = self._generate(
+                prompt,
+                generation_config={
+                    "response_mime_type": "application/json",
+                    "response_schema": BATCH_RESPONSE_SCHEMA
+                }
+            )
+        except Exception as e:
+            print(f"Error extracting batched profiles: {e}")
+            self.metrics.increment('extractor_fallbacks_total', extractor='extract_structured_profiles_batch', reason='error')
+            return results
+
+        data = self.safe_parse_json(response_text)
+        entries = data.get('profiles') if isinstance(data, dict) else None
+        if not isinstance(entries, list):
+            return results
+
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            key = str(entry.get('user_key', ''))
+            if key.startswith('u') and key[1:].isdigit() and int(key[1:]) < len(users):
+                results[int(key[1:])] = self.validate_structured_profile(entry)
+        return results
+
+    def _batch_user_tokens(self, user: Dict) -> int:
+        return estimate_tokens(self._format_batch_user("u0", user))
+
+    def _plan_batches(self, source: Iterator[Tuple[int, Dict]]) -> Iterator[List[Tuple[int, Dict]]]:
+        """Group consecutive (index, user) items into batches under the prompt budget
+
+        Users needing more than half of the budget on their own are sent alone.
+        """
+        if not self.batch_token_budget or self.max_batch_users == 1:
+            for item in source:
+                yield [item]
+            return
+
+        batch, batch_tokens = [], 0
+        for item in source:
+            tokens = self._batch_user_tokens(item[1])
+            if tokens * 2 > self.batch_token_budget:
+                if batch:
+                    yield batch
+                    batch, batch_tokens = [], 0
+                yield [item]
+                continue
+            if batch and (batch_tokens + tokens > self.batch_token_budget
+                          or len(batch) >= self.max_batch_users):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(item)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    def analyze_user_batch(self, batch: List[Tuple[int, Dict]], total: Optional[int] = None) -> List[Optional[UserProfile]]:
+        """Analyze a packed batch of (index, user) items, one profile (or None) per item
+
+        Users the batch response does not cover are analyzed on their own.
+        """
+        if len(batch) == 1:
+            index, user = batch[0]
+            return [self._analyze_user_safe(index, total, user)]
+
+        fields = self.extract_structured_profiles_batch([user for _, user in batch])
+        profiles = []
+        for (index, user), structured in zip(batch, fields):
+            if structured is None:
+                self.metrics.increment('extractor_fallbacks_total', extractor='extract_structured_profiles_batch', reason='uncovered')
+                profiles.append(self._analyze_user_safe(index, total, user))
+            else:
+                profiles.append(self._analyze_user_safe(index, total, user, structured))
+        return profiles
+
+    def analyze_user_profile(self, user: Dict, structured: Optional[Dict] = None) -> UserProfile:
+        """Analyze a single user's complete profile using LLM
+
+        structured may carry already extracted fields (e.g. from a batched
+        request), in which case no further structured request is made.
+        """
         full_name = user.get('UserName') or user.get('FullName', 'Unknown')
-        first_name, last_name = self.extract_name_parts(full_name)
-        age = user.get('Age', 'Unknown')
-        gender = user.get('Gender', 'Unknown')
-        marital_status = user.get('MaritalStatus', 'Unknown')
-        education = user.get('Education', 'Unknown')
-        job = user.get('Job', 'Unknown')
-        location = user.get('Location', 'Unknown')
-        posts = user.get('Posts', [])
         
         print(f"Analyzing profile for {full_name}...")
         
+        context = self.build_context(user)
 
-        top_interests = self.extract_top_interests(user)
-        personality_summary = self.generate_personality_summary(user)
-        key_activities = self.extract_key_activities(user)
-        top_habits, top_hobby = self.extract_habits_hobbies(user)
-        travel_frequency  = self.extract_travel_frequency(user)
-        life_indicators = self.extract_life_indicators(user)
-        spending_indicators = self.extract_spending_indicators(user)
-        
-        time.sleep(0.5)  
+        if structured is not None or self.structured_output:
+            initial = {'structured': structured} if structured is not None else None
+            results = self.structured_dag.run(context, self._get_extractor_pool(), initial)
+        else:
+            results = self.extractor_dag.run(context, self._get_extractor_pool())
+        top_habits, top_hobby = results['top_habits'], results['top_hobby']
         
         return UserProfile(
-            first_name=first_name,
-            last_name=last_name,
-            age=age,
-            gender=gender,
-            marital_status=marital_status,
-            education=education,
-            job=job,
-            location=location,
-            top_interests=top_interests,
-            personality_summary=personality_summary,
-            key_activities=key_activities,
-            total_posts=len(posts),
+            **self.user_fields(user),
+            top_interests=results['top_interests'],
+            personality_summary=results['personality_summary'],
+            key_activities=results['key_activities'],
             top_habits=top_habits if top_habits else ["none"],
             top_hobby=top_hobby if top_hobby else "none",
-            travel_frequency=travel_frequency,
-            life_indicators=life_indicators,
-            spending_indicators=spending_indicators
+            travel_frequency=results['travel_frequency'],
+            life_indicators=results['life_indicators'],
+            spending_indicators=results['spending_indicators'],
+            fingerprint=context.fingerprint
         )
+
+    def user_fields(self, user: Dict) -> Dict:
+        """Profile fields taken from the user record itself (name, demographics, post count, user key)"""
+        full_name = user.get('UserName') or user.get('FullName', 'Unknown')
+        first_name, last_name = self.extract_name_parts(full_name)
+        return {
+            'first_name': first_name,
+            'last_name': last_name,
+            'age': user.get('Age', 'Unknown'),
+            'gender': user.get('Gender', 'Unknown'),
+            'marital_status': user.get('MaritalStatus', 'Unknown'),
+            'education': user.get('Education', 'Unknown'),
+            'job': user.get('Job', 'Unknown'),
+            'location': user.get('Location', 'Unknown'),
+            'total_posts': len(user.get('Posts', [])),
+            'user_key': source_user_key(user)
+        }
+
+    def fingerprint_user(self, user: Union[Dict, UserContext]) -> str:
+        """Content fingerprint of a user's input record (profile fields and posts)"""
+        return self.build_context(user).fingerprint
     
-    def analyze_all_users(self, file_path: str) -> List[UserProfile]:
-        """Analyze all users and return their complete profiles"""
-        users = self.load_users_from_file(file_path)
+    def _analyze_user_safe(self, index: int, total: Optional[int], user: Dict,
+                           structured: Optional[Dict] = None) -> Optional[UserProfile]:
+        """Analyze one user, isolating failures so one bad user does not stop the run"""
+        print(f"Processing user {index+1}/{total}" if total else f"Processing user {index+1}")
+        try:
+            return self.analyze_user_profile(user, structured)
+        except Exception as e:
+            print(f"Error analyzing user {index+1} ({user.get('UserName', 'Unknown')}): {e}")
+            return None
+
+    def _iter_indexed_results(self, users: Union[str, Iterable[Dict]], max_workers: Optional[int] = None,
+                              previous_profiles: Optional[List[UserProfile]] = None
+                              ) -> Iterator[Tuple[int, Optional[UserProfile]]]:
+        """Yield (input index, profile or None on failure) in input order"""
+        if isinstance(users, str):
+            users = self.iter_users_from_file(users)
+        total = len(users) if isinstance(users, (list, tuple)) else None
+        workers = max(1, max_workers or self.max_workers)
+        reusable = {p.fingerprint: p for p in previous_profiles or [] if p.fingerprint}
+        source = enumerate(users)
+
+        def analyze(batch: List[Tuple[int, Dict]]) -> List[Tuple[int, Optional[UserProfile]]]:
+            results = {}
+            todo = []
+            for index, user in batch:
+                previous = reusable.get(self.fingerprint_user(user)) if reusable else None
+                if previous is not None:
+                    # Profiles saved before user keys existed get theirs here
+                    results[index] = previous if previous.user_key else replace(
+                        previous, user_key=source_user_key(user))
+                else:
+                    todo.append((index, user))
+            if todo:
+                results.update(zip((index for index, _ in todo), self.analyze_user_batch(todo, total)))
+            return [(index, results[index]) for index, _ in batch]
+
+        batches = self._plan_batches(source)
+        if workers == 1:
+            for batch in batches:
+                yield from analyze(batch)
+            return
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for batch in itertools.islice(batches, workers * 2):
+                pending.append(executor.submit(analyze, batch))
+            while pending:
+                results = pending.popleft().result()
+                for batch in itertools.islice(batches, 1):
+                    pending.append(executor.submit(analyze, batch))
+                yield from results
+
+    def iter_analyzed_profiles(self, users: Union[str, Iterable[Dict]], max_workers: Optional[int] = None,
+                               previous_profiles: Optional[List[UserProfile]] = None) -> Iterator[UserProfile]:
+        """Lazily analyze users (a file path or an iterable of user dicts), yielding profiles in input order
+
+        At most a small window of users per worker is pulled from the source
+        ahead of the profiles already yielded, so the input never has to be
+        materialized. Users whose analysis failed are skipped.
+        """
+        for _, profile in self._iter_indexed_results(users, max_workers, previous_profiles):
+            if profile is not None:
+                yield profile
+
+    def analyze_to_checkpoint(self, users: Union[str, Iterable[Dict]], checkpoint_path: str,
+                              resume: bool = False, max_workers: Optional[int] = None,
+                              flush_every: int = 1, fsync_every: int = 10) -> List[UserProfile]:
+        """Analyze users, appending each finished profile to a JSONL checkpoint
+
+        Every record holds the user's input index next to the profile fields,
+        including the input fingerprint. With resume=True the existing
+        checkpoint is kept and every user whose input still matches a
+        checkpointed fingerprint reuses that profile; all others (new or
+        changed input, or analysis that failed last time) are analyzed again.
+        Returns the profiles of the given users in input order.
+        """
+        with CheckpointWriter(checkpoint_path, resume=resume, flush_every=flush_every,
+                              fsync_every=fsync_every) as writer:
+            checkpointed = {}
+            fingerprint_at = {}
+            for record in writer.existing_records:
+                fingerprint_at[record['index']] = record.get('fingerprint')
+                if record.get('fingerprint'):
+                    checkpointed[record['fingerprint']] = profile_from_dict(record)
+            if checkpointed:
+                print(f"Resuming with {len(checkpointed)} checkpointed profiles")
+
+            profiles = []
+            for index, profile in self._iter_indexed_results(users, max_workers,
+                                                             previous_profiles=list(checkpointed.values())):
+                if profile is None:
+                    continue
+                if fingerprint_at.get(index) != profile.fingerprint:
+                    writer.write({'index': index, **profile_to_dict(profile)})
+                    fingerprint_at[index] = profile.fingerprint
+                profiles.append(profile)
+        return profiles
+
+    def analyze_all_users(self, file_path: Union[str, Iterable[Dict]], max_workers: Optional[int] = None,
+                          previous_profiles: Optional[List[UserProfile]] = None) -> List[UserProfile]:
+        """Analyze all users and return their complete profiles
+
+        Users are analyzed on a pool of max_workers threads (defaults to the
+        analyzer's max_workers); profiles are returned in input order and
+        users whose analysis failed are left out. Users whose input fingerprint
+        matches one of previous_profiles reuse that profile instead.
+        file_path may also be any iterable of user dicts, e.g. from
+        iter_users_from_file, which is consumed lazily.
+        """
+        return list(self.iter_analyzed_profiles(file_path, max_workers=max_workers,
+                                                previous_profiles=previous_profiles))
+
+    def compute_corpus_features(self, users: List[Dict]):
+        """Keyword counts and travel frequency for every user, computed column-wise with pandas"""
+        from columnar import CorpusFeatures
+
+        return CorpusFeatures(users, self.keyword_scanner)
+
+    def analyze_corpus(self, users: Union[str, List[Dict]], max_workers: Optional[int] = None,
+                       previous_profiles: Optional[List[UserProfile]] = None) -> List[UserProfile]:
+        """Analyze a whole user set, computing the heuristic features in one columnar batch first
+
+        The precomputed keyword statistics are handed to each user's context,
+        so the per-user stage only makes the LLM calls.
+        """
+        if isinstance(users, str):
+            users = self.load_users_from_file(users)
+        features = self.compute_corpus_features(users)
+        contexts = [self.build_context(user, features.keyword_counts(i)) for i, user in enumerate(users)]
+        return self.analyze_all_users(contexts, max_workers=max_workers, previous_profiles=previous_profiles)
+
+    def analyze_deduplicated(self, users: Union[str, List[Dict]], max_workers: Optional[int] = None,
+                             threshold: float = 0.8) -> List[UserProfile]:
+        """Analyze a user set, running the LLM only once per cluster of duplicate post sets
+
+        Users are clustered by exact and MinHash/LSH near-duplicate posts
+        (see dedup.find_duplicates). Only each cluster's representative is
+        analyzed; the other members reuse its analyzed fields with their own
+        name, demographics, post count, user key and fingerprint.
+        """
+        from dedup import cluster_sizes, find_duplicates
+
+        if isinstance(users, str):
+            users = self.load_users_from_file(users)
+        representatives = find_duplicates(users, threshold)
+        sizes = cluster_sizes(representatives)
+        reps = sorted(sizes)
+        print(f"{len(users)} users in {len(reps)} clusters "
+              f"({len(users) - len(reps)} duplicates reuse a representative's analysis)")
+
+        analyzed = dict(zip(reps, (profile for _, profile in
+                                   self._iter_indexed_results([users[i] for i in reps], max_workers))))
         profiles = []
-        
-        for i, user in enumerate(users):
-            print(f"Processing user {i+1}/{len(users)}")
-            profile = self.analyze_user_profile(user)
-            profiles.append(profile)
-        
+        for index, user in enumerate(users):
+            rep_profile = analyzed[representatives[index]]
+            if rep_profile is None:
+                continue
+            if representatives[index] == index:
+                profiles.append(rep_profile)
+            else:
+                self.metrics.increment('duplicate_profiles_reused_total')
+                profiles.append(replace(rep_profile, **self.user_fields(user),
+                                        fingerprint=self.fingerprint_user(user)))
         return profiles
+
+    def collect_profiles(self, users: Union[str, Iterable[Dict]], max_workers: Optional[int] = None):
+        """Analyze users straight into a memory-lean ProfileStore"""
+        from profile_store import ProfileStore
+
+        return ProfileStore(self.iter_analyzed_profiles(users, max_workers=max_workers))
+
+    def update_results(self, file_path: str, output_file: str,
+                       max_workers: Optional[int] = None) -> List[UserProfile]:
+        """Incrementally refresh output_file, re-analyzing only users whose input changed
+
+        Profiles of users that are no longer in the input (by user_key) are
+        kept after the refreshed ones.
+        """
+        previous = self.load_results(output_file)
+        profiles = self.analyze_all_users(file_path, max_workers=max_workers, previous_profiles=previous)
+
+        previous_fingerprints = {p.fingerprint for p in previous if p.fingerprint}
+        reused = sum(1 for p in profiles if p.fingerprint in previous_fingerprints)
+        print(f"Reused {reused}/{len(profiles)} unchanged profiles")
+
+        current_keys = {p.user_key for p in profiles}
+        current_fingerprints = {p.fingerprint for p in profiles}
+        current_names = {(p.first_name, p.last_name) for p in profiles}
+
+        def still_in_input(profile: UserProfile) -> bool:
+            if profile.user_key:
+                return profile.user_key in current_keys
+            # Saved before user keys existed: match by fingerprint, else by name
+            return (profile.fingerprint in current_fingerprints
+                    or (profile.first_name, profile.last_name) in current_names)
+
+        merged = profiles + [p for p in previous if not still_in_input(p)]
+        self.save_results(merged, output_file)
+        return merged
     
     def print_user_profile(self, profile: UserProfile):
         """Print a single user's profile in a formatted way"""
@@ -649,49 +1387,43 @@ class LLMUserProfileAnalyzer:
     
     def save_results(self, profiles: List[UserProfile], output_file: str):
         """Save results to JSON file"""
-        profiles_dict = []
-        for profile in profiles:
-            profile_dict = {
-                'first_name': profile.first_name,
-                'last_name': profile.last_name,
-                'age': profile.age,
-                'gender': profile.gender,
-                'marital_status': profile.marital_status,
-                'education': profile.education,
-                'job': profile.job,
-                'location': profile.location,
-                'top_interests': profile.top_interests,
-                'personality_summary': profile.personality_summary,
-                'key_activities': profile.key_activities,
-                'total_posts': profile.total_posts,
-                'top_habits': profile.top_habits,
-                'top_hobby': profile.top_hobby,
-                'travel_indicators': profile.travel_frequency,
-                'life_indicators': profile.life_indicators,
-                'spending_indicators': profile.spending_indicators
-            }
-            profiles_dict.append(profile_dict)
+        profiles_dict = [profile_to_dict(profile) for profile in profiles]
         
         with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(profiles_dict, f, indent=2, ensure_ascii=False)
 
-def main():
+    def load_results(self, output_file: str) -> List[UserProfile]:
+        """Load previously saved profiles (empty list if the file is missing or invalid)"""
+        try:
+            with open(output_file, 'r', encoding='utf-8') as f:
+                return [profile_from_dict(item) for item in json.load(f)]
+        except FileNotFoundError:
+            return []
+        except (json.JSONDecodeError, TypeError, KeyError) as e:
+            print(f"Error reading previous results from '{output_file}': {e}")
+            return []
+
+def main(resume: bool = False):
     try:
-        analyzer = LLMUserProfileAnalyzer(api_key='')
+        analyzer = LLMUserProfileAnalyzer(api_key='', cache=LLMCache())
         file_path = "dummy_users.json"
         
-        users = analyzer.load_users_from_file(file_path)
-        profiles = []
-        for user in users[18:19]:
-            profiles.append(analyzer.analyze_user_profile(user))
+        users = itertools.islice(analyzer.iter_users_from_file(file_path), 18, 19)
+        checkpoint_file = "llm_user_profiles_analysis.checkpoint.jsonl"
+        profiles = analyzer.analyze_to_checkpoint(users, checkpoint_file, resume=resume)
         
         analyzer.print_all_profiles(profiles)
         output_file = "llm_user_profiles_analysis.json"
         analyzer.save_results(profiles, output_file)
         print(f" Results saved to: {output_file}")
+        metrics_file = "llm_metrics.json"
+        analyzer.metrics.write_snapshot(metrics_file)
+        print(f" Metrics saved to: {metrics_file}")
         
     except Exception as e:
         print(f"An error occurred: {e}")
 
 if __name__ == "__main__":
-    main()
+    import sys
+
+    main(resume="--resume" in sys.argv[1:])
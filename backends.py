@@ -0,0 +1,192 @@
+# backends.py
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class BackendResponse:
+    """Minimal response object exposing the generated text like Gemini responses do"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class LLMBackend:
+    """Interface of the model behind LLMUserProfileAnalyzer.model"""
+
+    model_name = "unknown"
+
+    def generate_content(self, prompt: str, generation_config: Optional[Dict] = None):
+        """Return an object with a .text attribute holding the model output"""
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini backend (requires google-generativeai and an API key)"""
+
+    def __init__(self, api_key: str = None, model_name: str = 'gemini-1.5-flash'):
+        import google.generativeai as genai
+
+        api_key = api_key or os.getenv('GEMINI_API_KEY')
+        if not api_key:
+            raise ValueError("Please provide a Gemini API key either as parameter or set GEMINI_API_KEY environment variable")
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate_content(self, prompt: str, generation_config: Optional[Dict] = None):
+        if generation_config:
+            return self.model.generate_content(prompt, generation_config=generation_config)
+        return self.model.generate_content(prompt)
+
+
+class SimulatedBackendError(Exception):
+    """Error raised by OfflineBackend to simulate API failures"""
+
+
+DEFAULT_CATEGORIES = [
+    "technology", "education", "fashion", "food", "sports", "traveling",
+    "music", "health", "finance", "business", "family", "reading"
+]
+
+
+class OfflineBackend(LLMBackend):
+    """Deterministic local stand-in for the LLM with simulated latency and errors
+
+    Responses are canned but well-formed for every analyzer prompt and depend
+    only on the prompt text. Latency is drawn from latency_distribution
+    ('constant', 'uniform', 'exponential' or 'lognormal') around latency
+    seconds, and error_rate of calls raise a retryable SimulatedBackendError.
+    Random draws are seeded by seed, the prompt and how many times in a row
+    that prompt has just failed, so runs are reproducible regardless of
+    thread scheduling. Only prompts whose last call failed are tracked, so
+    the state stays as small as the number of calls awaiting a retry.
+    """
+
+    def __init__(self, latency: float = 0.0, latency_distribution: str = 'constant',
+                 error_rate: float = 0.0, seed: int = 0, model_name: str = 'offline-stub'):
+        if latency_distribution not in ('constant', 'uniform', 'exponential', 'lognormal'):
+            raise ValueError(f"Unknown latency distribution: {latency_distribution}")
+        self.latency = latency
+        self.latency_distribution = latency_distribution
+        self.error_rate = error_rate
+        self.seed = seed
+        self.model_name = model_name
+        self.calls = 0
+        self._failed_attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Copies sent to worker processes get their own lock
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _draw_latency(self, rng: random.Random) -> float:
+        if self.latency <= 0:
+            return 0.0
+        if self.latency_distribution == 'uniform':
+            return rng.uniform(0, 2 * self.latency)
+        if self.latency_distribution == 'exponential':
+            return rng.expovariate(1 / self.latency)
+        if self.latency_distribution == 'lognormal':
+            # Median equal to latency with a heavy right tail
+            return self.latency * rng.lognormvariate(0, 0.5)
+        return self.latency
+
+    def generate_content(self, prompt: str, generation_config: Optional[Dict] = None):
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        with self._lock:
+            self.calls += 1
+            attempt = self._failed_attempts.get(digest, 0)
+
+        rng = random.Random(f"{self.seed}:{digest}:{attempt}")
+        delay = self._draw_latency(rng)
+        if delay:
+            time.sleep(delay)
+        failed = rng.random() < self.error_rate
+        with self._lock:
+            if failed:
+                self._failed_attempts[digest] = attempt + 1
+            else:
+                self._failed_attempts.pop(digest, None)
+        if failed:
+            raise SimulatedBackendError("429 Resource exhausted (simulated)")
+
+        return BackendResponse(self._respond(prompt, generation_config, random.Random(digest)))
+
+    def _categories(self, prompt: str) -> List[str]:
+        match = re.search(r"Available interest categories:\s*\n\s*(.+)", prompt)
+        if match:
+            categories = [c.strip() for c in match.group(1).split(',') if c.strip()]
+            if len(categories) >= 3:
+                return categories
+        return DEFAULT_CATEGORIES
+
+    def _structured_fields(self, categories: List[str], rng: random.Random) -> Dict:
+        interests = rng.sample(categories, 3)
+        first = rng.randint(34, 60)
+        second = rng.randint(10, (100 - first) - 10)
+        return {
+            "top_interests": [
+                {"interest": interests[0], "percentage": first},
+                {"interest": interests[1], "percentage": second},
+                {"interest": interests[2], "percentage": 100 - first - second}
+            ],
+            "personality_summary": self._summary(rng),
+            "key_activities": self._activities(rng),
+            "top_habits": rng.sample(HABITS, 2),
+            "top_hobby": rng.choice(HOBBIES),
+            "spending_indicators": rng.sample(SPENDING, 2)
+        }
+
+    def _summary(self, rng: random.Random) -> str:
+        return f"A {rng.choice(TRAITS)} person who values {rng.choice(VALUES)}. " \
+               f"Balances professional growth with {rng.choice(VALUES)}."
+
+    def _activities(self, rng: random.Random) -> List[str]:
+        return rng.sample(ACTIVITIES, 3)
+
+    def _respond(self, prompt: str, generation_config: Optional[Dict], rng: random.Random) -> str:
+        categories = self._categories(prompt)
+        schema = json.dumps((generation_config or {}).get('response_schema', {}))
+        if '"profiles"' in schema:
+            keys = re.findall(r"USER (u\d+):", prompt)
+            return json.dumps({"profiles": [
+                {"user_key": key, **self._structured_fields(categories, rng)} for key in keys
+            ]})
+        if generation_config:
+            return json.dumps(self._structured_fields(categories, rng))
+        if "most prominent interests" in prompt:
+            fields = self._structured_fields(categories, rng)["top_interests"]
+            return ','.join(f"{item['interest']},{item['percentage']}" for item in fields)
+        if "habits and hobbies" in prompt:
+            return f"habits: {', '.join(rng.sample(HABITS, 2))}\nhobby: {rng.choice(HOBBIES)}"
+        if "spending behaviors" in prompt:
+            return json.dumps(rng.sample(SPENDING, 2))
+        if "significant activities" in prompt:
+            return '\n'.join(f"{i}. {activity}" for i, activity in enumerate(self._activities(rng), 1))
+        return self._summary(rng)
+
+
+TRAITS = ["curious", "driven", "sociable", "thoughtful", "creative", "practical"]
+VALUES = ["family ties", "continuous learning", "community", "craftsmanship", "well-being"]
+HABITS = ["morning jogging", "daily journaling", "evening reading", "weekly meal prep",
+          "regular gym sessions", "weekend family visits"]
+HOBBIES = ["photography", "cooking", "football", "drawing", "gardening", "gaming"]
+SPENDING = ["Regular investments in professional development", "Occasional luxury leisure purchases",
+            "Frequent spending on dining out", "Seasonal travel expenditures"]
+ACTIVITIES = ["Attended a workshop on user experience design",
+              "Organized a family gathering for a holiday celebration",
+              "Started a new fitness routine with gym workouts",
+              "Completed an online course to improve professional skills",
+              "Visited a local market to support small businesses"]
@@ -0,0 +1,203 @@
+# benchmark.py
+"""Benchmark the analyzer pipeline against replicated dummy_users.json fixtures
+
+Runs offline (backends.OfflineBackend with simulated latency), e.g.:
+
+    python benchmark.py --sizes 1000 10000 --latency 0.002 --workers 8
+
+and writes users/sec, p50/p95 latency per extractor, load/save timings and
+peak RSS to a JSON file so runs can be compared between commits.
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from analyzer import LLMUserProfileAnalyzer
+from backends import OfflineBackend
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+TIMED_METHODS = [
+    'analyze_user_profile', 'extract_top_interests', 'generate_personality_summary',
+    'extract_key_activities', 'extract_habits_hobbies', 'extract_travel_frequency',
+    'extract_life_indicators', 'extract_spending_indicators', 'extract_structured_profile'
+]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MiB (0 where unsupported)
+
+    The value is a high-water mark over the whole process lifetime, so
+    main() runs every size in a fresh process to keep sizes apart.
+    """
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB on Linux
+    return peak / (1024 * 1024) if platform.system() == 'Darwin' else peak / 1024
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def instrument(analyzer: LLMUserProfileAnalyzer) -> Dict[str, List[float]]:
+    """Wrap the analyzer's extractors on the instance, recording wall time per call"""
+    timings: Dict[str, List[float]] = defaultdict(list)
+    lock = threading.Lock()
+
+    def wrap(name, method):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with lock:
+                    timings[name].append(elapsed)
+        return timed
+
+    for name in TIMED_METHODS:
+        setattr(analyzer, name, wrap(name, getattr(analyzer, name)))
+    return timings
+
+
+def replicate(users: List[Dict], size: int) -> List[Dict]:
+    """size users cycled from the fixture, with distinct names so fingerprints differ"""
+    replicated = []
+    for i, user in enumerate(itertools.islice(itertools.cycle(users), size)):
+        copy = dict(user)
+        copy['UserName'] = f"{user.get('UserName', 'Unknown')} {i // len(users)}"
+        replicated.append(copy)
+    return replicated
+
+
+def timed_call(func, *args, **kwargs):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run_size(users: List[Dict], size: int, args) -> Dict:
+    fixture = replicate(users, size)
+    analyzer = LLMUserProfileAnalyzer(
+        backend=OfflineBackend(latency=args.latency, latency_distribution=args.distribution,
+                               error_rate=args.error_rate, seed=args.seed),
+        max_workers=args.workers, structured_output=args.structured
+    )
+    result = {'users': size}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        array_path = os.path.join(tmp, 'users.json')
+        jsonl_path = os.path.join(tmp, 'users.jsonl')
+        with open(array_path, 'w', encoding='utf-8') as f:
+            json.dump(fixture, f, ensure_ascii=False)
+        with open(jsonl_path, 'w', encoding='utf-8') as f:
+            for user in fixture:
+                f.write(json.dumps(user, ensure_ascii=False) + '\n')
+
+        loaded, elapsed = timed_call(analyzer.load_users_from_file, array_path)
+        result['load_json_seconds'] = elapsed
+        result['load_json_users_per_sec'] = len(loaded) / elapsed if elapsed else 0.0
+        loaded, elapsed = timed_call(analyzer.load_users_from_file, jsonl_path)
+        result['load_jsonl_seconds'] = elapsed
+        result['load_jsonl_users_per_sec'] = len(loaded) / elapsed if elapsed else 0.0
+
+        timings = instrument(analyzer)
+        profiles, elapsed = timed_call(analyzer.analyze_all_users, fixture)
+        result['analyze_seconds'] = elapsed
+        result['analyze_users_per_sec'] = len(profiles) / elapsed if elapsed else 0.0
+        result['latency_ms'] = {
+            name: {'calls': len(values),
+                   'p50': percentile(values, 50) * 1000,
+                   'p95': percentile(values, 95) * 1000}
+            for name, values in sorted(timings.items())
+        }
+
+        _, elapsed = timed_call(analyzer.save_results, profiles, os.path.join(tmp, 'out.json'))
+        result['save_seconds'] = elapsed
+        result['save_users_per_sec'] = len(profiles) / elapsed if elapsed else 0.0
+
+    result['model_calls'] = analyzer.model.calls
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def run_size_isolated(fixture_path: str, size: int, args) -> Dict:
+    """Worker process: load the fixture and benchmark one size"""
+    analyzer = LLMUserProfileAnalyzer(backend=OfflineBackend())
+    with contextlib.redirect_stdout(io.StringIO()):
+        users = analyzer.load_users_from_file(fixture_path)
+    return run_size(users, size, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fixture', default='dummy_users.json')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--latency', type=float, default=0.0, help="mean simulated model latency in seconds")
+    parser.add_argument('--distribution', default='constant',
+                        choices=['constant', 'uniform', 'exponential', 'lognormal'])
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--structured', action='store_true', help="use single-call structured extraction")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.json')
+    args = parser.parse_args()
+
+    analyzer = LLMUserProfileAnalyzer(backend=OfflineBackend())
+    users = analyzer.load_users_from_file(args.fixture)
+    if not users:
+        raise SystemExit(f"No users loaded from {args.fixture}")
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'config': {k: v for k, v in vars(args).items() if k != 'output'},
+        'results': []
+    }
+    # A spawned process per size starts with a clean peak RSS; forked
+    # children would inherit this process's high-water mark
+    context = multiprocessing.get_context('spawn')
+    for size in args.sizes:
+        print(f"Benchmarking {size} users...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(run_size_isolated, args.fixture, size, args).result()
+        report['results'].append(result)
+        print(f"  {result['analyze_users_per_sec']:.1f} users/sec, peak RSS {result['peak_rss_mb']:.1f} MiB")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
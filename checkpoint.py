@@ -0,0 +1,78 @@
+# checkpoint.py
+import json
+import os
+from typing import Dict, List, Tuple
+
+
+def read_checkpoint(path: str) -> Tuple[List[Dict], int]:
+    """Read the complete records of a JSONL checkpoint
+
+    Returns the records and the byte offset just past the last complete
+    record; a trailing partial line (left by a crash mid-write) is ignored.
+    """
+    records = []
+    valid_offset = 0
+    try:
+        with open(path, 'rb') as f:
+            offset = 0
+            for line in f:
+                offset += len(line)
+                if not line.endswith(b'\n'):
+                    break
+                if line.strip():
+                    try:
+                        records.append(json.loads(line.decode('utf-8')))
+                    except (UnicodeDecodeError, json.JSONDecodeError):
+                        break
+                valid_offset = offset
+    except FileNotFoundError:
+        pass
+    return records, valid_offset
+
+
+class CheckpointWriter:
+    """Append-only JSONL writer that flushes and fsyncs on a configurable cadence
+
+    Records are flushed to the OS every flush_every writes and forced to disk
+    every fsync_every writes (0 disables fsync until close). With resume=True
+    an existing checkpoint is kept and any partial trailing record is cut off;
+    otherwise the file is started fresh.
+    """
+
+    def __init__(self, path: str, resume: bool = False, flush_every: int = 1, fsync_every: int = 10):
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self.fsync_every = fsync_every
+        self.records_written = 0
+        self.existing_records: List[Dict] = []
+        if resume:
+            self.existing_records, valid_offset = read_checkpoint(path)
+            self.file = open(path, 'ab')
+            self.file.truncate(valid_offset)
+        else:
+            self.file = open(path, 'wb')
+
+    def write(self, record: Dict):
+        """Append one record as a JSON line"""
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        self.file.write(line.encode('utf-8'))
+        self.records_written += 1
+        if self.records_written % self.flush_every == 0:
+            self.file.flush()
+        if self.fsync_every and self.records_written % self.fsync_every == 0:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        """Flush, fsync and close the checkpoint file"""
+        if self.file.closed:
+            return
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
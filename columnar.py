@@ -0,0 +1,73 @@
+# columnar.py
+import re
+from typing import Dict, Iterable, List
+
+import pandas as pd
+
+from keyword_scanner import KeywordScanner
+
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = "string[pyarrow]"
+except ImportError:
+    STRING_DTYPE = "string"
+
+TRAVEL_BINS = [-1, 0, 2, 5, float('inf')]
+TRAVEL_LABELS = ["no travel", "rare", "occasional", "frequent"]
+
+
+def build_post_frame(users: Iterable[Dict]) -> pd.DataFrame:
+    """One row per post with its user_id (position in users) and lowercased text"""
+    posts = pd.Series([user.get('Posts', []) for user in users], dtype=object)
+    frame = posts.explode().dropna().rename('post').rename_axis('user_id').reset_index()
+    frame['post'] = frame['post'].astype(STRING_DTYPE).str.lower()
+    return frame
+
+
+class CorpusFeatures:
+    """Keyword-based heuristic features for a whole user set, computed column-wise
+
+    Keyword counts come from one vectorized count per distinct keyword over
+    the post column, summed per user with a group-by and folded into the
+    scanner's group/category layout. Counts equal KeywordScanner's per user;
+    substring counts cannot reproduce whole_words matching, so such scanners
+    are rejected.
+    """
+
+    def __init__(self, users: List[Dict], keyword_scanner: KeywordScanner):
+        if keyword_scanner.whole_words:
+            raise ValueError("CorpusFeatures needs a substring KeywordScanner (whole_words=False)")
+        self.keyword_scanner = keyword_scanner
+        self.user_count = len(users)
+        posts = build_post_frame(users)
+
+        keyword_columns = {kw: posts['post'].str.count(re.escape(kw)).astype('int64')
+                           for kw in keyword_scanner.keywords}
+        per_post = pd.DataFrame(keyword_columns, index=posts.index)
+        per_user = (per_post.groupby(posts['user_id']).sum()
+                    .reindex(range(self.user_count), fill_value=0))
+
+        columns = {}
+        for group, categories in keyword_scanner.groups.items():
+            for category, kws in categories.items():
+                columns[(group, category)] = per_user[[kw.lower() for kw in kws]].sum(axis=1)
+        self.counts = pd.DataFrame(columns, index=per_user.index)
+        self.counts.columns = pd.MultiIndex.from_tuples(self.counts.columns, names=['group', 'category'])
+
+        travel_total = self.counts['travel'].sum(axis=1)
+        self.travel_frequency = pd.cut(travel_total, bins=TRAVEL_BINS, labels=TRAVEL_LABELS).astype(str)
+
+    def keyword_counts(self, user_id: int) -> Dict[str, Dict[str, int]]:
+        """Group -> category -> count for one user, in the scanner's layout"""
+        row = self.counts.iloc[user_id]
+        result = self.keyword_scanner.empty_counts()
+        for (group, category), value in row.items():
+            result[group][category] = int(value)
+        return result
+
+    def to_frame(self) -> pd.DataFrame:
+        """Flat per-user feature table: '<group>.<category>' counts plus travel_frequency"""
+        frame = self.counts.copy()
+        frame.columns = [f"{group}.{category}" for group, category in frame.columns]
+        frame['travel_frequency'] = self.travel_frequency
+        return frame
@@ -1,128 +1,453 @@
 # db.py
 import pymysql
+import hashlib
 import json
-from typing import Dict, Any
+import queue
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+from migrations import run_migrations
+
+PROFILE_COLUMNS = (
+    "first_name", "last_name", "age", "gender", "marital_status", "education", "job", "location",
+    "first_interest", "first_interest_percentage",
+    "second_interest", "second_interest_percentage",
+    "third_interest", "third_interest_percentage",
+    "personality_summary", "key_activities", "total_posts", "top_habits",
+    "top_hobby", "travel_indicators", "life_indicators", "spending_indicators"
+)
+
+# Fallback identity for profile dicts without a user_key (outputs written
+# before user_context.source_user_key existed); names only, never demographics
+# that change between syncs
+IDENTITY_FIELDS = ("first_name", "last_name")
+
+# Rows whose content_hash is unchanged keep every column (content_hash is
+# assigned last, so the IF()s still compare against the stored hash)
+UPSERT_PROFILE_SQL = (
+    "INSERT INTO user_profiles (user_key, content_hash, " + ", ".join(PROFILE_COLUMNS) + ") "
+    "VALUES (" + ", ".join(["%s"] * (len(PROFILE_COLUMNS) + 2)) + ") "
+    "ON DUPLICATE KEY UPDATE " + ", ".join(
+        f"{column} = IF(content_hash = VALUES(content_hash), {column}, VALUES({column}))"
+        for column in PROFILE_COLUMNS) + ", content_hash = VALUES(content_hash)"
+)
+
+# Child table -> INSERT of (profile_id, ...) rows; rebuilt whenever a profile changes
+CHILD_INSERT_SQL = {
+    "profile_interest": "INSERT INTO profile_interest (profile_id, position, interest, percentage) "
+                        "VALUES (%s, %s, %s, %s)",
+    "profile_habit": "INSERT INTO profile_habit (profile_id, position, habit) VALUES (%s, %s, %s)",
+    "profile_activity": "INSERT INTO profile_activity (profile_id, position, activity) VALUES (%s, %s, %s)",
+    "profile_indicator": "INSERT INTO profile_indicator (profile_id, kind, position, indicator) "
+                         "VALUES (%s, %s, %s, %s)",
+}
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def profile_user_key(profile_data: Dict[str, Any], identity_fields: Tuple[str, ...] = IDENTITY_FIELDS) -> str:
+    """Stable natural key of a profile: the source user key the analyzer
+    stored in it, else a hash of the normalized identity fields"""
+    if profile_data.get("user_key"):
+        return str(profile_data["user_key"])
+    identity = "|".join(_WHITESPACE.sub(" ", str(profile_data.get(field, "") or "")).strip().lower()
+                        for field in identity_fields)
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+
+def content_hash(values: tuple) -> str:
+    """Hash of a profile's stored column values"""
+    return hashlib.sha256(json.dumps(values, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+class ConnectionPool:
+    """Thread-safe pool of up to size pymysql connections
+
+    Connections are opened lazily and reused. One that sat idle for longer
+    than health_check_interval seconds is pinged (reconnecting if the server
+    dropped it) before being handed out; one that cannot be revived is
+    replaced by a fresh connection.
+    """
+
+    def __init__(self, size: int = 5, health_check_interval: float = 30.0, **connect_kwargs):
+        self.size = max(1, size)
+        self.health_check_interval = health_check_interval
+        self.connect_kwargs = connect_kwargs
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self):
+        return pymysql.connect(cursorclass=pymysql.cursors.DictCursor, **self.connect_kwargs)
+
+    def _healthy(self, connection, idle_since: float):
+        """Return a usable connection, pinging it if it has been idle too long"""
+        if time.monotonic() - idle_since < self.health_check_interval and connection.open:
+            return connection
+        try:
+            connection.ping(reconnect=True)
+            return connection
+        except pymysql.Error as e:
+            print(f" Stale database connection replaced: {e}")
+            try:
+                connection.close()
+            except pymysql.Error:
+                pass
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+    def acquire(self, timeout: Optional[float] = None):
+        """Take a connection, opening one if the pool is not full yet, else waiting for a release"""
+        if self._closed:
+            raise pymysql.InterfaceError("Connection pool is closed")
+        try:
+            connection, idle_since = self._idle.get_nowait()
+            return self._healthy(connection, idle_since)
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            connection, idle_since = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise pymysql.OperationalError(f"No database connection available within {timeout}s")
+        return self._healthy(connection, idle_since)
+
+    def release(self, connection):
+        """Return a connection to the pool (dropping it if it is closed or the pool is)"""
+        if self._closed or not connection.open:
+            with self._lock:
+                self._created -= 1
+            if connection.open:
+                connection.close()
+            return
+        self._idle.put((connection, time.monotonic()))
+
+    def close(self):
+        """Close every idle connection; connections still in use are closed on release"""
+        self._closed = True
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._created -= 1
+            if connection.open:
+                connection.close()
+
 
 class Database:
-    def __init__(self, host: str, user: str, password: str, db: str):
+    def __init__(self, host: str, user: str, password: str, db: str,
+                 pool_size: int = 5, health_check_interval: float = 30.0,
+                 identity_fields: Tuple[str, ...] = IDENTITY_FIELDS, migrate: bool = True):
+        """Pooled access to the profiles database
+
+        Up to pool_size connections are kept open and shared by sessions
+        (see session()), so one Database can serve many writes and reads,
+        from several threads, without reconnecting each time.
+        Profiles are upserted by the user_key the analyzer derives from the
+        source user record, or a hash of identity_fields for profile dicts
+        that lack one.
+        Pending schema migrations are applied once here (unless migrate is
+        False), so writes never issue DDL.
+        """
+        self.identity_fields = identity_fields
+        self.pool = ConnectionPool(pool_size, health_check_interval,
+                                   host=host, user=user, password=password, db=db)
         try:
-            self.connection = pymysql.connect(
-                host=host,
-                user=user,
-                password=password,
-                db=db,
-                cursorclass=pymysql.cursors.DictCursor
-            )
-            self.cursor = self.connection.cursor()
+            self.pool.release(self.pool.acquire())
             print(" Database connection successful") 
         except pymysql.Error as e:
             print(f" Database connection failed: {e}")
             raise
+        if migrate:
+            self.migrate()
 
-    def _create_table_if_not_exists(self):
-        """Ensure the table exists with correct structure"""
+    @contextmanager
+    def session(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        """Borrow a pooled connection for one unit of work
+
+        Commits when the block completes, rolls back if it raises, and
+        always returns the connection to the pool.
+        """
+        connection = self.pool.acquire(timeout)
         try:
-            self.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS user_profiles (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    first_name VARCHAR(50) NOT NULL,
-                    last_name VARCHAR(50) NOT NULL,
-                    age INT,
-                    gender VARCHAR(20),
-                    marital_status VARCHAR(50),
-                    education VARCHAR(100),
-                    job VARCHAR(100),
-                    location VARCHAR(100),
-                    first_interest VARCHAR(50),
-                    first_interest_percentage INT,
-                    second_interest VARCHAR(50),
-                    second_interest_percentage INT,
-                    third_interest VARCHAR(50),
-                    third_interest_percentage INT,
-                    personality_summary TEXT,
-                    key_activities TEXT,
-                    total_posts INT,
-                    top_habits TEXT,
-                    top_hobby VARCHAR(100),
-                    travel_indicators VARCHAR(50),
-                    life_indicators TEXT,
-                    spending_indicators TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            self.connection.commit()
-            print(" Table verified/created successfully")
+            yield connection
+            connection.commit()
+        except Exception:
+            try:
+                connection.rollback()
+            except pymysql.Error:
+                pass
+            raise
+        finally:
+            self.pool.release(connection)
+
+    def migrate(self) -> int:
+        """Bring the schema up to the latest version (see migrations.py)"""
+        try:
+            with self.session() as connection:
+                version = run_migrations(connection)
+            print(f" Database schema at version {version}")
+            return version
         except pymysql.Error as e:
-            print(f" Table creation failed: {e}")
+            print(f" Schema migration failed: {e}")
             raise
 
+    def _row_values(self, profile_data: Dict[str, Any]) -> tuple:
+        """user_key, content_hash and the profile columns, in UPSERT_PROFILE_SQL order"""
+        values = self._profile_values(profile_data)
+        return (profile_user_key(profile_data, self.identity_fields), content_hash(values)) + values
+
+    @staticmethod
+    def _child_rows(profile_data: Dict[str, Any]) -> Dict[str, List[tuple]]:
+        """Child table rows of a profile, without the leading profile_id"""
+        def strings(key, length):
+            return [(position, str(value)[:length])
+                    for position, value in enumerate(profile_data.get(key) or []) if value]
+
+        return {
+            "profile_interest": [(position, str(item.get("interest"))[:50], item.get("percentage", 0))
+                                 for position, item in enumerate(profile_data.get("top_interests") or [])
+                                 if isinstance(item, dict) and item.get("interest")],
+            "profile_habit": strings("top_habits", 255),
+            "profile_activity": strings("key_activities", 500),
+            "profile_indicator": ([("life",) + row for row in strings("life_indicators", 255)] +
+                                  [("spending",) + row for row in strings("spending_indicators", 255)]),
+        }
+
+    def _prepare(self, profile_data: Dict[str, Any]) -> Tuple[tuple, Dict[str, List[tuple]]]:
+        return self._row_values(profile_data), self._child_rows(profile_data)
+
+    def _write_rows(self, cursor, rows: List[Tuple[tuple, Dict[str, List[tuple]]]]) -> int:
+        """Upsert prepared rows and rebuild the child rows of every new or changed
+        profile, on the caller's transaction; returns how many profiles changed"""
+        keys = [values[0] for values, _ in rows]
+        placeholders = ", ".join(["%s"] * len(keys))
+        cursor.execute(f"SELECT user_key, content_hash FROM user_profiles WHERE user_key IN ({placeholders})",
+                       keys)
+        stored = {row["user_key"]: row["content_hash"] for row in cursor.fetchall()}
+
+        if len(rows) == 1:
+            cursor.execute(UPSERT_PROFILE_SQL, rows[0][0])
+        else:
+            cursor.executemany(UPSERT_PROFILE_SQL, [values for values, _ in rows])
+
+        changed = {values[0]: children for values, children in rows if stored.get(values[0]) != values[1]}
+        if not changed:
+            return 0
+        placeholders = ", ".join(["%s"] * len(changed))
+        cursor.execute(f"SELECT id, user_key FROM user_profiles WHERE user_key IN ({placeholders})",
+                       list(changed))
+        ids = {row["user_key"]: row["id"] for row in cursor.fetchall()}
+        id_placeholders = ", ".join(["%s"] * len(ids))
+        for table, sql in CHILD_INSERT_SQL.items():
+            cursor.execute(f"DELETE FROM {table} WHERE profile_id IN ({id_placeholders})", list(ids.values()))
+            child_rows = [(ids[key],) + row for key, children in changed.items() for row in children[table]]
+            if child_rows:
+                cursor.executemany(sql, child_rows)
+        return len(changed)
+
+    @staticmethod
+    def _profile_values(profile_data: Dict[str, Any]) -> tuple:
+        """Row values of a profile dict in PROFILE_COLUMNS order"""
+        interests = profile_data.get("top_interests", [{} for _ in range(3)])
+        return (
+            profile_data.get("first_name", ""),
+            profile_data.get("last_name", ""),
+            profile_data.get("age"),
+            profile_data.get("gender", ""),
+            profile_data.get("marital_status", ""),
+            profile_data.get("education", ""),
+            profile_data.get("job", ""),
+            profile_data.get("location", ""),
+            interests[0].get("interest", ""),
+            interests[0].get("percentage", 0),
+            interests[1].get("interest", ""),
+            interests[1].get("percentage", 0),
+            interests[2].get("interest", ""),
+            interests[2].get("percentage", 0),
+            profile_data.get("personality_summary", ""),
+            json.dumps(profile_data.get("key_activities", [])),
+            profile_data.get("total_posts", 0),
+            json.dumps(profile_data.get("top_habits", [])),
+            profile_data.get("top_hobby", ""),
+            profile_data.get("travel_indicators", ""),
+            json.dumps(profile_data.get("life_indicators", [])),
+            json.dumps(profile_data.get("spending_indicators", []))
+        )
+
     def insert_user_profile(self, profile_data: Dict[str, Any]) -> bool:
-        """Insert a user profile with transaction handling"""
+        """Insert or update a user profile with transaction handling
+
+        The row is keyed by user_key; an existing row (and its interest,
+        habit, activity and indicator rows) is only rewritten when the
+        profile's content hash changed.
+        """
         try:
-            self._create_table_if_not_exists()  # Ensure table exists
-            
-            interests = profile_data.get("top_interests", [{} for _ in range(3)])
-            
-            sql = """
-            INSERT INTO user_profiles (
-                first_name, last_name, age, gender, marital_status, education, job, location,
-                first_interest, first_interest_percentage,
-                second_interest, second_interest_percentage,
-                third_interest, third_interest_percentage,
-                personality_summary, key_activities, total_posts, top_habits,
-                top_hobby, travel_indicators, life_indicators, spending_indicators
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, %s, %s, %s, %s, %s
-            )
-            """
-            
-            values = (
-                profile_data.get("first_name", ""),
-                profile_data.get("last_name", ""),
-                profile_data.get("age"),
-                profile_data.get("gender", ""),
-                profile_data.get("marital_status", ""),
-                profile_data.get("education", ""),
-                profile_data.get("job", ""),
-                profile_data.get("location", ""),
-                interests[0].get("interest", ""),
-                interests[0].get("percentage", 0),
-                interests[1].get("interest", ""),
-                interests[1].get("percentage", 0),
-                interests[2].get("interest", ""),
-                interests[2].get("percentage", 0),
-                profile_data.get("personality_summary", ""),
-                json.dumps(profile_data.get("key_activities", [])),
-                profile_data.get("total_posts", 0),
-                json.dumps(profile_data.get("top_habits", [])),
-                profile_data.get("top_hobby", ""),
-                profile_data.get("travel_indicators", ""),
-                json.dumps(profile_data.get("life_indicators", [])),
-                json.dumps(profile_data.get("spending_indicators", []))
-            )
-
-            self.cursor.execute(sql, values)
-            self.connection.commit()
-            print("Profile inserted successfully")
+            row = self._prepare(profile_data)
+
+            with self.session() as connection, connection.cursor() as cursor:
+                changed = self._write_rows(cursor, [row])
+            print("Profile inserted successfully" if changed else "Profile unchanged")
             return True
 
         except pymysql.Error as e:
-            self.connection.rollback()
             print(f" Database error: {e}")
             return False
         except Exception as e:
-            self.connection.rollback()
             print(f" Unexpected error: {e}")
             return False
-        finally:
-            self.close()
+
+    def _insert_chunk(self, chunk: List[Tuple[int, tuple]]) -> List[Tuple[int, str]]:
+        """Write (index, prepared row) items in one transaction, falling back to one
+        transaction per row if the chunk fails; returns (index, error) per failed row"""
+        try:
+            with self.session() as connection, connection.cursor() as cursor:
+                self._write_rows(cursor, [row for _, row in chunk])
+            return []
+        except pymysql.Error as e:
+            if len(chunk) == 1:
+                return [(chunk[0][0], str(e))]
+
+        errors = []
+        for index, row in chunk:
+            try:
+                with self.session() as connection, connection.cursor() as cursor:
+                    self._write_rows(cursor, [row])
+            except pymysql.Error as e:
+                errors.append((index, str(e)))
+        return errors
+
+    def insert_user_profiles(self, profiles: Iterable[Dict[str, Any]],
+                             chunk_size: int = 500) -> Tuple[int, List[Tuple[int, str]]]:
+        """Bulk-upsert profile dicts with one multi-row INSERT and commit per chunk
+
+        profiles is consumed lazily, chunk_size rows at a time. Rows are keyed
+        by user_key and left untouched when their content hash is unchanged,
+        so re-running a sync does not duplicate or rewrite profiles; changed
+        profiles get their child table rows rebuilt in the same transaction. A chunk the
+        server rejects is rolled back and retried row by row, so only the
+        offending rows are lost. Returns the number of rows inserted and an
+        (input index, error message) pair for every row that failed.
+        """
+        chunk_size = max(1, chunk_size)
+        inserted = 0
+        errors: List[Tuple[int, str]] = []
+        chunk: List[Tuple[int, tuple]] = []
+
+        def flush():
+            nonlocal inserted
+            failed = self._insert_chunk(chunk)
+            errors.extend(failed)
+            inserted += len(chunk) - len(failed)
+            chunk.clear()
+
+        for index, profile_data in enumerate(profiles):
+            try:
+                chunk.append((index, self._prepare(profile_data)))
+            except Exception as e:
+                errors.append((index, f"Invalid profile: {e}"))
+                continue
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk:
+            flush()
+
+        for index, error in errors:
+            print(f" Profile {index} not inserted: {error}")
+        print(f"Upserted {inserted} profiles ({len(errors)} failed)")
+        return inserted, errors
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        with self.session() as connection, connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return list(cursor.fetchall())
+
+    def profiles_with_habit(self, habit: str) -> List[Dict[str, Any]]:
+        """Profiles listing habit among their top habits"""
+        return self._query("""
+            SELECT p.* FROM profile_habit h
+            JOIN user_profiles p ON p.id = h.profile_id
+            WHERE h.habit = %s
+        """, (habit,))
+
+    def profiles_with_interest(self, interest: str, min_percentage: int = 0) -> List[Dict[str, Any]]:
+        """Profiles with interest among their top three at min_percentage or more, strongest first"""
+        return self._query("""
+            SELECT p.*, i.percentage AS interest_percentage FROM profile_interest i
+            JOIN user_profiles p ON p.id = i.profile_id
+            WHERE i.interest = %s AND i.percentage >= %s
+            ORDER BY i.percentage DESC
+        """, (interest, min_percentage))
+
+    def interest_share_by_location(self) -> List[Dict[str, Any]]:
+        """Per location and interest: profiles naming it and its share of the
+        location's interest percentage points"""
+        # Joined per-location totals instead of a window function, which
+        # needs MySQL 8.0 / MariaDB 10.2; <=> keeps profiles without a location
+        return self._query("""
+            SELECT p.location, i.interest, COUNT(*) AS profiles,
+                   SUM(i.percentage) / MAX(t.total) AS share
+            FROM profile_interest i
+            JOIN user_profiles p ON p.id = i.profile_id
+            JOIN (
+                SELECT lp.location, SUM(li.percentage) AS total
+                FROM profile_interest li
+                JOIN user_profiles lp ON lp.id = li.profile_id
+                GROUP BY lp.location
+            ) t ON t.location <=> p.location
+            GROUP BY p.location, i.interest
+            ORDER BY p.location, share DESC
+        """)
+
+    def indicator_counts(self, kind: str = "life", limit: int = 20) -> List[Dict[str, Any]]:
+        """Most common life or spending indicators with the number of profiles showing each"""
+        return self._query("""
+            SELECT indicator, COUNT(*) AS profiles FROM profile_indicator
+            WHERE kind = %s
+            GROUP BY indicator
+            ORDER BY profiles DESC
+            LIMIT %s
+        """, (kind, limit))
+
+    def top_habits(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most common habits with the number of profiles listing each"""
+        return self._query("""
+            SELECT habit, COUNT(*) AS profiles FROM profile_habit
+            GROUP BY habit
+            ORDER BY profiles DESC
+            LIMIT %s
+        """, (limit,))
 
     def close(self):
-        """Close the connection properly"""
-        if hasattr(self, 'cursor'):
-            self.cursor.close()
-        if hasattr(self, 'connection') and self.connection.open:
-            self.connection.close()
-        print("🔌 Database connection closed")
\ No newline at end of file
+        """Close the pooled connections properly"""
+        if hasattr(self, 'pool'):
+            self.pool.close()
+        print("🔌 Database connection closed")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
\ No newline at end of file
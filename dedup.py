@@ -0,0 +1,124 @@
+# dedup.py
+import hashlib
+import re
+from typing import Dict, List
+
+import numpy as np
+
+# Smallest prime above 2**32: a * h + b stays below 2**64 for 32-bit a, b and h
+PRIME = 4294967311
+MAX_HASH = (1 << 32) - 1
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_posts(posts: List[str]) -> str:
+    """Lowercased, whitespace-collapsed post text used for duplicate detection"""
+    return '\n'.join(_WHITESPACE.sub(' ', str(post)).strip().lower() for post in posts or [])
+
+
+def posts_hash(posts: List[str]) -> str:
+    """Exact-duplicate key of a post set"""
+    return hashlib.sha256(normalize_posts(posts).encode('utf-8')).hexdigest()
+
+
+def shingles(text: str, size: int = 5) -> set:
+    """Character n-grams of text (script-agnostic, so Arabic and mixed posts work too)"""
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures over 32-bit shingle hashes with seeded universal permutations"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, MAX_HASH, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, MAX_HASH, size=num_perm, dtype=np.uint64)
+
+    def signature(self, features: set) -> np.ndarray:
+        """Minimum permuted hash per permutation; all MAX_HASH for an empty feature set"""
+        if not features:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(f.encode('utf-8'), digest_size=4).digest(), 'little')
+             for f in features), dtype=np.uint64, count=len(features))
+        permuted = np.bitwise_and((np.outer(hashes, self.a) + self.b) % PRIME, MAX_HASH)
+        return permuted.min(axis=0)
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i: int, j: int):
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            # The earliest user stays the cluster representative
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+
+def find_duplicates(users: List[Dict], threshold: float = 0.8, num_perm: int = 64,
+                    bands: int = 16, shingle_size: int = 5, seed: int = 1) -> List[int]:
+    """Representative index for every user, clustering users by their posts
+
+    Users with identical normalized posts are clustered by exact hash; the
+    remaining distinct post sets are compared with MinHash signatures
+    bucketed by LSH (bands of num_perm // bands rows) and joined when their
+    estimated Jaccard similarity reaches threshold. The representative is the
+    earliest user of its cluster, so representatives[i] == i for users that
+    must be analyzed. Users without posts, or whose posts are all blank, are
+    never clustered.
+    """
+    uf = _UnionFind(len(users))
+    first_by_hash: Dict[str, int] = {}
+    distinct: List[int] = []
+    for index, user in enumerate(users):
+        text = normalize_posts(user.get('Posts'))
+        if not text.strip():
+            continue
+        key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        first = first_by_hash.setdefault(key, index)
+        if first == index:
+            distinct.append(index)
+        else:
+            uf.union(first, index)
+
+    if threshold < 1.0 and len(distinct) > 1:
+        hasher = MinHasher(num_perm, seed)
+        rows = num_perm // bands
+        signatures: Dict[int, np.ndarray] = {}
+        buckets: Dict[tuple, List[int]] = {}
+        for index in distinct:
+            signature = hasher.signature(shingles(normalize_posts(users[index]['Posts']), shingle_size))
+            signatures[index] = signature
+            for band in range(bands):
+                key = (band, signature[band * rows:(band + 1) * rows].tobytes())
+                buckets.setdefault(key, []).append(index)
+
+        checked = set()
+        for members in buckets.values():
+            for pos, i in enumerate(members):
+                for j in members[pos + 1:]:
+                    if (i, j) in checked:
+                        continue
+                    checked.add((i, j))
+                    if np.mean(signatures[i] == signatures[j]) >= threshold:
+                        uf.union(i, j)
+
+    return [uf.find(index) for index in range(len(users))]
+
+
+def cluster_sizes(representatives: List[int]) -> Dict[int, int]:
+    """Number of users per representative"""
+    sizes: Dict[int, int] = {}
+    for rep in representatives:
+        sizes[rep] = sizes.get(rep, 0) + 1
+    return sizes
@@ -0,0 +1,92 @@
+# extractor_dag.py
+from concurrent.futures import FIRST_COMPLETED, Executor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class ExtractorNode:
+    """One extractor step: reads `inputs` from upstream results and produces `outputs`
+
+    func is called as func(context, inputs_dict) and returns a single value
+    when there is one output, or a tuple with one value per output.
+    """
+    name: str
+    func: Callable[[Any, Dict[str, Any]], Any]
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+
+
+class ExtractorDAG:
+    """Dependency-aware scheduler for a set of extractor nodes
+
+    Nodes start as soon as all their inputs are available; with an executor
+    independent nodes run concurrently, otherwise nodes run one by one in
+    dependency order.
+    """
+
+    def __init__(self, nodes: List[ExtractorNode]):
+        self.nodes = list(nodes)
+        self.producers: Dict[str, ExtractorNode] = {}
+        for node in self.nodes:
+            for output in node.outputs:
+                if output in self.producers:
+                    raise ValueError(f"Output '{output}' is produced by both "
+                                     f"'{self.producers[output].name}' and '{node.name}'")
+                self.producers[output] = node
+        for node in self.nodes:
+            missing = [name for name in node.inputs if name not in self.producers]
+            if missing:
+                raise ValueError(f"Node '{node.name}' needs inputs nobody produces: {missing}")
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[ExtractorNode]:
+        order, done, visiting = [], set(), set()
+
+        def visit(node: ExtractorNode):
+            if node.name in done:
+                return
+            if node.name in visiting:
+                raise ValueError(f"Cycle detected at node '{node.name}'")
+            visiting.add(node.name)
+            for name in node.inputs:
+                visit(self.producers[name])
+            visiting.discard(node.name)
+            done.add(node.name)
+            order.append(node)
+
+        for node in self.nodes:
+            visit(node)
+        return order
+
+    @staticmethod
+    def _store(node: ExtractorNode, value: Any, results: Dict[str, Any]):
+        if len(node.outputs) == 1:
+            results[node.outputs[0]] = value
+        else:
+            results.update(zip(node.outputs, value))
+
+    def run(self, context: Any, executor: Optional[Executor] = None,
+            initial: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run every node whose outputs are not already in initial and return all results"""
+        results = dict(initial or {})
+        remaining = [node for node in self.order
+                     if not all(output in results for output in node.outputs)]
+
+        if executor is None:
+            for node in remaining:
+                self._store(node, node.func(context, {name: results[name] for name in node.inputs}), results)
+            return results
+
+        running = {}
+        while remaining or running:
+            for node in [n for n in remaining if all(name in results for name in n.inputs)]:
+                remaining.remove(node)
+                inputs = {name: results[name] for name in node.inputs}
+                running[executor.submit(node.func, context, inputs)] = node
+            if not running:
+                raise RuntimeError("Extractor DAG stalled with unsatisfied inputs")
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                self._store(running.pop(future), future.result(), results)
+        return results
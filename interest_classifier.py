@@ -0,0 +1,159 @@
+# interest_classifier.py
+import math
+from typing import Dict, List, Tuple
+
+from keyword_scanner import KeywordScanner
+
+# Category -> keyword -> weight, matched case-insensitively as whole words
+# (KeywordScanner whole_words): English ones plus a plural 's'/'es', so 'ngo'
+# never fires inside 'hangout'; Arabic ones with attached clitics (و، ف، ب،
+# ك، ل، ال، لل) and suffixes, so 'رياض' matches 'والرياضة' while 'علوم' stays
+# out of 'المعلومات'. Words still ambiguous as whole words are listed only in
+# longer forms ('كرة القدم', since 'فكرة' / 'بكرة' read as ف/ب + 'كرة') or
+# left out ('رئيس' also means 'main').
+INTEREST_KEYWORDS: Dict[str, Dict[str, float]] = {
+    "technology": {"technology": 2, "software": 2, "programming": 2, "coding": 2, "developer": 2,
+                   "computer": 1.5, "laptop": 1, "app": 1, "ai": 1, "machine learning": 2,
+                   "fpga": 2, "python": 1.5, "javascript": 1.5, "gadget": 1, "tech": 1,
+                   "تكنولوجيا": 2, "برمجة": 2, "البرمجة": 2, "كمبيوتر": 1.5, "تطبيق": 1, "ذكاء اصطناعي": 2},
+    "education": {"student": 1.5, "school": 1, "university": 1.5, "course": 1.5, "lecture": 1.5,
+                  "exam": 1.5, "teacher": 1.5, "teaching": 1.5, "learn": 1, "learning": 1, "study": 1, "studying": 1,
+                  "class": 0.5, "scholarship": 2,
+                  "جامعة": 1.5, "الجامعة": 1.5, "مدرسة": 1, "المدرسة": 1, "دراسة": 1, "امتحان": 1.5,
+                  "محاضرة": 1.5, "طلاب": 1, "تعليم": 1.5, "دورة": 1, "دورات": 1, "درس": 1},
+    "fashion": {"fashion": 2, "outfit": 2, "dress": 1, "clothes": 1.5, "style": 1, "shoes": 1,
+                "designer brand": 2, "makeup": 1.5, "hijab style": 2,
+                "موضة": 2, "فستان": 1.5, "لبس": 1, "هدوم": 1.5, "أزياء": 2, "ميكب": 1.5},
+    "food": {"restaurant": 2, "food": 1.5, "delicious": 1.5, "dinner": 0.5, "lunch": 0.5, "breakfast": 0.5,
+             "koshari": 2, "molokhia": 2, "pizza": 1, "dessert": 1.5, "cafe": 1, "coffee": 0.5,
+             "مطعم": 2, "أكل": 1.5, "أكلة": 1.5, "فطار": 0.5, "غداء": 0.5, "حلويات": 1.5, "كشري": 2},
+    "sports": {"football": 2, "soccer": 2, "match": 1, "basketball": 2, "tennis": 2, "swimming": 1.5,
+               "sport": 1.5, "champions league": 2, "al ahly": 2, "zamalek": 2, "marathon": 1.5,
+               "كورة": 2, "الكرة": 1.5, "كرة القدم": 2, "ماتش": 2, "مباراة": 2, "رياض": 1.5, "الأهلي": 2, "الزمالك": 2, "سباحة": 1.5},
+    "traveling": {"travel": 2, "traveling": 2, "travelling": 2, "trip": 1.5, "vacation": 2, "journey": 1.5, "flight": 1.5, "hotel": 1,
+                  "itinerary": 2, "tour": 1, "destination": 1.5, "beach": 1,
+                  "سفر": 2, "رحلة": 1.5, "سياحة": 2, "فندق": 1, "طيارة": 1.5, "مصيف": 1.5, "الساحل": 1},
+    "music": {"music": 2, "song": 1.5, "concert": 2, "guitar": 2, "piano": 2, "singing": 1.5,
+              "album": 1.5, "oud": 1.5, "playlist": 1.5,
+              "موسيقى": 2, "أغنية": 1.5, "اغنية": 1.5, "حفلة": 1.5, "جيتار": 2, "غناء": 1.5},
+    "health": {"health": 2, "doctor": 1.5, "medical": 2, "medicine": 2, "hospital": 1.5, "patient": 1.5,
+               "vaccine": 1.5, "vaccination": 1.5, "nutrition": 1.5, "mental health": 2, "diet": 1, "sleep": 0.5,
+               "صحة": 2, "الصحة": 2, "دكتور": 1.5, "مستشفى": 1.5, "علاج": 1.5, "العلاج": 1.5, "الوقاية": 1.5,
+               "التطعيم": 1.5, "مريض": 1.5},
+    "finance": {"finance": 2, "invest": 2, "investing": 2, "investment": 2, "stock": 1.5, "bank": 1.5, "savings": 1.5, "budget": 1.5,
+                "crypto": 2, "accounting": 2, "money": 1, "salary": 1,
+                "استثمار": 2, "بورصة": 2, "بنك": 1.5, "فلوس": 1, "ميزانية": 1.5, "محاسبة": 2, "مرتب": 1},
+    "automotive": {"car": 1.5, "engine": 1.5, "driving": 1, "mechanic": 2, "motorcycle": 2,
+                   "bmw": 2, "toyota": 2, "mercedes": 2, "garage": 1.5,
+                   "عربيتي": 2, "سيارة": 2, "موتور": 1.5, "ميكانيكي": 2, "بنزين": 1},
+    "agriculture": {"farm": 2, "farming": 2, "farmer": 2, "agriculture": 2, "agricultural": 2, "harvest": 2, "crop": 2, "irrigation": 2, "cotton": 1.5,
+                    "wheat": 1.5, "planting": 1.5, "greenhouse": 2,
+                    "زراعة": 2, "الزراعة": 2, "مزرعة": 2, "محصول": 2, "حصاد": 2, "قطن": 1.5, "قمح": 1.5},
+    "art": {"artist": 2, "painting": 2, "drawing": 2, "gallery": 2, "museum": 1.5, "sketch": 1.5,
+            "graphic design": 2, "illustration": 2, "illustrator": 2, "calligraphy": 2, "sculpture": 2, "exhibition": 1.5,
+            "architecture": 1, "design": 1,
+            "رسمة": 1.5, "رسمت": 1.5, "لوحة": 2, "معرض": 1.5, "تصميم": 1.5, "التصميم": 1.5, "خط عربي": 2, "متحف": 1.5},
+    "entertainment": {"movie": 2, "film": 1.5, "series": 1.5, "netflix": 2, "cinema": 2, "theater": 1.5,
+                      "comedy": 1.5, "show": 0.5, "ramadan series": 2,
+                      "فيلم": 2, "افلام": 2, "مسلسل": 2, "سينما": 2, "مسرح": 1.5, "نتفليكس": 2, "كوميدي": 1.5},
+    "fitness": {"gym": 2, "workout": 2, "exercise": 2, "fitness": 2, "yoga": 2, "running": 1.5,
+                "training": 1, "cardio": 2, "protein": 1.5, "#stayactive": 1.5,
+                "جيم": 2, "الجيم": 2, "تمارين": 2, "تمرين": 2, "رشاقة": 1.5, "يوجا": 2, "جري": 1.5},
+    "gaming": {"gaming": 2, "video game": 2, "playstation": 2, "ps5": 2, "xbox": 2, "fifa": 2,
+               "pubg": 2, "gamer": 2, "esports": 2, "steam": 1,
+               "ألعاب": 1.5, "العاب": 1.5, "بلايستيشن": 2, "جيمز": 2, "لعبة": 1},
+    "photography": {"photography": 2, "photo": 1.5, "camera": 2, "lens": 1.5, "shoot": 1, "portrait": 1.5,
+                    "canon": 2, "nikon": 2, "lightroom": 2,
+                    "تصوير": 2, "صورة": 1, "صور": 1, "كاميرا": 2, "عدسة": 1.5, "مصور": 2},
+    "reading": {"reading": 2, "book": 1.5, "novel": 2, "author": 1.5, "library": 1.5, "poetry": 1.5,
+                "literature": 1.5, "bibliotheca": 1.5, "chapter": 1,
+                "قراءة": 2, "كتاب": 1.5, "رواية": 2, "مكتبة": 1.5, "شعر": 1, "الأدب": 1.5, "قصائد": 1.5},
+    "cooking": {"cooking": 2, "recipe": 2, "baking": 2, "cooked": 2, "kitchen": 1.5, "chef": 1.5,
+                "homemade": 1.5, "oven": 1,
+                "طبخ": 2, "طبخت": 2, "وصفة": 2, "مطبخ": 1.5, "شيف": 1.5, "خبز": 1, "عملت أكل": 2},
+    "nature": {"nature": 2, "hiking": 2, "camping": 2, "mountain": 1.5, "desert": 1.5, "sunset": 1,
+               "sea": 1, "river": 1, "nile": 1, "garden": 1, "wildlife": 2, "environment": 1.5,
+               "طبيعة": 2, "الطبيعة": 2, "جبل": 1.5, "صحراء": 1.5, "البحر": 1, "النيل": 1, "غروب": 1, "تخييم": 2},
+    "science": {"science": 2, "research": 1.5, "physics": 2, "chemistry": 2, "biology": 2, "laboratory": 1.5,
+                "lab": 1, "experiment": 1.5, "engineering": 1, "astronomy": 2, "scientific": 2,
+                "علوم": 2, "بحث": 1.5, "فيزياء": 2, "كيمياء": 2, "معمل": 1.5, "تجربة علمية": 2, "هندسة": 1},
+    "business": {"business": 2, "startup": 2, "entrepreneur": 2, "marketing": 1.5, "client": 1.5,
+                 "sales": 1.5, "meeting": 1, "conference": 1, "brand": 1, "company": 1, "project": 0.5,
+                 "بيزنس": 2, "شركة": 1.5, "مشروع": 1, "تسويق": 1.5, "عميل": 1.5, "عملاء": 1.5, "اجتماع": 1},
+    "politics": {"politics": 2, "political": 2, "election": 2, "government": 1.5, "parliament": 2, "president": 1.5,
+                 "minister": 1.5, "policy": 1, "vote": 1.5,
+                 "سياسة": 2, "انتخابات": 2, "حكومة": 1.5, "الحكومة": 1.5, "برلمان": 2, "وزير": 1.5},
+    "religion": {"ramadan": 1.5, "prayer": 2, "mosque": 2, "quran": 2, "church": 2, "eid": 1, "faith": 1.5,
+                 "friday prayer": 2, "fasting": 1.5,
+                 "رمضان": 1.5, "صلاة": 2, "الصلاة": 2, "مسجد": 2, "قرآن": 2, "القرآن": 2,
+                 "كنيسة": 2, "العيد": 1, "الحمد لله": 1, "ربنا": 1},
+    "volunteer work": {"volunteer": 2, "charity": 2, "donate": 2, "donation": 2, "donated": 2, "ngo": 2, "community service": 2,
+                       "fundraising": 2, "orphan": 1.5, "food bank": 2,
+                       "تطوع": 2, "تطوعي": 2, "متطوع": 2, "خيري": 2, "خيرية": 2, "تبرع": 2, "أيتام": 1.5, "جمعية": 1},
+    "family": {"family": 2, "kids": 1.5, "children": 1.5, "my son": 2, "my daughter": 2, "my wife": 2,
+               "my husband": 2, "parent": 1.5, "mom": 1, "dad": 1, "wedding": 1.5,
+               "عائلة": 2, "العيلة": 2, "عيلتي": 2, "أولادي": 2, "ابني": 2, "بنتي": 2, "مراتي": 2, "جوزي": 2,
+               "ماما": 1, "بابا": 1},
+    "social activities": {"friend": 1.5, "party": 1.5, "gathering": 1.5, "hangout": 2, "hang out": 2,
+                          "meetup": 2, "celebration": 1.5, "networking": 1.5, "reunion": 2,
+                          "أصحاب": 2, "اصحاب": 2, "صحابي": 2, "خروجة": 2, "تجمع": 1.5, "حفلة": 1, "سهرة": 1.5},
+}
+
+# Job / education text is short but highly indicative
+PROFILE_FIELD_WEIGHT = 3.0
+# Weighted hits at which evidence is ~63% of full strength
+EVIDENCE_SCALE = 6.0
+TOP_K = 3
+
+
+class InterestClassifier:
+    """Keyword-weighted local classifier over the analyzer's interest categories
+
+    Scores every category by weighted keyword hits (English and Arabic) in
+    the posts, with job and education hits weighted higher, and turns the top
+    three scores into whole percentages summing to 100. The confidence in
+    [0, 1] grows with the amount of evidence and with how much of it falls
+    on the top three categories; it is 0 when fewer than three match.
+    """
+
+    def __init__(self, categories: List[str], keywords: Dict[str, Dict[str, float]] = None):
+        keywords = keywords or INTEREST_KEYWORDS
+        self.categories = list(categories)
+        self.weights: Dict[str, Dict[str, float]] = {}
+        for category in self.categories:
+            for kw, weight in keywords.get(category, {}).items():
+                self.weights.setdefault(kw.lower(), {})[category] = weight
+        self.scanner = KeywordScanner({
+            'interests': {category: list(keywords.get(category, {})) for category in self.categories}
+        }, whole_words=True)
+
+    def scores(self, posts_text_lower: str, job: str = "", education: str = "") -> Dict[str, float]:
+        """Weighted keyword score per category"""
+        scores = dict.fromkeys(self.categories, 0.0)
+        sources = ((posts_text_lower, True, 1.0), (f"{job}\n{education}", False, PROFILE_FIELD_WEIGHT))
+        for text, lowered, factor in sources:
+            for kw, count in self.scanner.count_keywords(text, lowered=lowered).items():
+                for category, weight in self.weights[kw].items():
+                    scores[category] += weight * count * factor
+        return scores
+
+    def classify(self, posts_text_lower: str, job: str = "",
+                 education: str = "") -> Tuple[List[Dict[str, int]], float]:
+        """Top three interests with percentages, and the confidence of the prediction"""
+        scores = self.scores(posts_text_lower, job, education)
+        ranked = sorted(((score, category) for category, score in scores.items() if score > 0),
+                        key=lambda item: -item[0])[:TOP_K]
+        if not ranked:
+            return [], 0.0
+
+        top_total = sum(score for score, _ in ranked)
+        percentages = [int(score * 100 // top_total) for score, _ in ranked]
+        percentages[0] += 100 - sum(percentages)
+        interests = [{'interest': category, 'percentage': pct}
+                     for (_, category), pct in zip(ranked, percentages)]
+
+        if len(ranked) < TOP_K:
+            return interests, 0.0
+        evidence = 1 - math.exp(-top_total / EVIDENCE_SCALE)
+        concentration = top_total / sum(scores.values())
+        return interests, evidence * (0.5 + 0.5 * concentration)
@@ -0,0 +1,98 @@
+# keyword_scanner.py
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+_WORD_START = r'(?<![a-z0-9])'
+_WORD_END = r'(?=(?:e?s)?(?![a-z0-9]))'
+
+# Arabic words carry attached clitics: a keyword may follow a word start
+# directly or after و/ف, then ب/ك/ل, then the article ال (or لل), e.g.
+# 'وبالجامعة'. Each lookbehind is fixed-width as re requires.
+_ARABIC_LETTER = '[\u0621-\u064a\u066e-\u06d3]'
+_ARABIC_WORD_START = '(?:' + '|'.join(
+    f'(?<=(?<!{_ARABIC_LETTER}){prefix})' if prefix else f'(?<!{_ARABIC_LETTER})'
+    for prefix in ('', '[وفبكل]', '(?:ال|لل|[وف][بكل])', '(?:[وفبك]ال|[وف]لل)', '[وف][بك]ال')
+) + ')'
+# ... and may be followed by a plural, feminine or possessive suffix
+_ARABIC_WORD_END = f'(?=(?:ات|ية|ة|ين|ون|ي|ه|ها|هم|ك|كم|نا|اً|ًا)?(?!{_ARABIC_LETTER}))'
+
+
+class KeywordScanner:
+    """Single-pass multi-pattern keyword counter shared by the heuristic extractors
+
+    groups maps group name -> category -> keywords, e.g.
+    {'travel': {'trip': ['trip']}, 'spending': {'travel': ['trip', 'hotel']}}.
+    All keywords are compiled into one alternation regex; each text is
+    lowercased and scanned once, and every group's category counts come from
+    that pass. Counts match summing str.count(keyword) per keyword: overlapping
+    matches of different keywords (e.g. 'work' inside 'workshop') are all
+    counted, repeated matches of the same keyword are not allowed to overlap.
+
+    With whole_words=True, keywords only match as whole words: ASCII keywords
+    optionally followed by a plural 's' or 'es' ('car' matches 'cars' but not
+    'scarf'), Arabic ones with their usual attached prefixes and suffixes
+    ('رياض' matches 'والرياضة' but 'كرة' does not match 'مذاكرة').
+    """
+
+    def __init__(self, groups: Dict[str, Dict[str, List[str]]], whole_words: bool = False):
+        self.groups = groups
+        self.whole_words = whole_words
+        keywords = sorted({kw.lower() for categories in groups.values()
+                           for kws in categories.values() for kw in kws},
+                          key=lambda kw: (-len(kw), kw))
+        self.keywords = keywords
+        bounded = set(keywords) if whole_words else set()
+
+        def alternative(kw: str) -> str:
+            if kw not in bounded:
+                return re.escape(kw)
+            if kw.isascii():
+                return _WORD_START + re.escape(kw) + _WORD_END
+            return _ARABIC_WORD_START + re.escape(kw) + _ARABIC_WORD_END
+
+        # Zero-width lookahead so a match is attempted at every position
+        self.pattern = re.compile('(?=(' + '|'.join(alternative(kw) for kw in keywords) + '))')
+        # The longest keyword found at a position also accounts for its shorter
+        # prefixes, unless a whole-word prefix would end inside a word there
+        self._prefixes = {
+            kw: [other for other in keywords if kw.startswith(other)
+                 and (other not in bounded or other == kw or not kw[len(other)].isalnum())]
+            for kw in keywords
+        }
+        self._targets: Dict[str, List[tuple]] = defaultdict(list)
+        for group, categories in groups.items():
+            for category, kws in categories.items():
+                for kw in kws:
+                    self._targets[kw.lower()].append((group, category))
+
+    def count_keywords(self, text: str, lowered: bool = False) -> Dict[str, int]:
+        """Occurrences of every keyword in text (case-insensitive; pass lowered=True
+        when text is already lowercase)"""
+        counts: Dict[str, int] = defaultdict(int)
+        next_allowed: Dict[str, int] = {}
+        for match in self.pattern.finditer(text if lowered else text.lower()):
+            start = match.start()
+            for kw in self._prefixes[match.group(1)]:
+                if start >= next_allowed.get(kw, 0):
+                    counts[kw] += 1
+                    next_allowed[kw] = start + len(kw)
+        return counts
+
+    def empty_counts(self) -> Dict[str, Dict[str, int]]:
+        """Zeroed group -> category -> count mapping in declaration order"""
+        return {group: {category: 0 for category in categories}
+                for group, categories in self.groups.items()}
+
+    def category_counts(self, texts: Iterable[str], lowered: bool = False) -> Dict[str, Dict[str, int]]:
+        """Group -> category -> total keyword hits over texts, one scan per text"""
+        result = self.empty_counts()
+        for text in texts:
+            self.add_counts(result, self.count_keywords(text, lowered))
+        return result
+
+    def add_counts(self, result: Dict[str, Dict[str, int]], keyword_counts: Dict[str, int]):
+        """Accumulate per-keyword counts into a group -> category mapping in place"""
+        for kw, count in keyword_counts.items():
+            for group, category in self._targets[kw]:
+                result[group][category] += count
@@ -0,0 +1,123 @@
+# llm_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+class LLMCache:
+    """Persistent SQLite cache of model responses keyed by model name + prompt hash
+
+    Entries older than max_age_seconds are treated as misses, and once the
+    stored responses exceed max_size_bytes the least recently used entries
+    are evicted.
+    """
+
+    def __init__(self, db_path: str = "llm_cache.sqlite3",
+                 max_size_bytes: Optional[int] = 100 * 1024 * 1024,
+                 max_age_seconds: Optional[float] = 30 * 24 * 3600):
+        self.db_path = db_path
+        self.max_size_bytes = max_size_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_responses_last_access ON llm_responses (last_access)"
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str, generation_config: Optional[Dict] = None) -> str:
+        """Content address of a request: hash of model, generation config and prompt"""
+        config = json.dumps(generation_config or {}, sort_keys=True, default=str)
+        payload = f"{model_name}\n{config}\n{prompt}".encode('utf-8')
+        return hashlib.sha256(payload).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and self.max_age_seconds is not None and now - row[1] > self.max_age_seconds:
+                self.connection.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                self.connection.commit()
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.connection.execute("UPDATE llm_responses SET last_access = ? WHERE key = ?", (now, key))
+            self.connection.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model_name: str, response: str):
+        """Store a response and evict least recently used entries over the size limit"""
+        now = time.time()
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, model, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, response, len(response.encode('utf-8')), now, now)
+            )
+            self._evict()
+            self.connection.commit()
+
+    def _evict(self):
+        if self.max_age_seconds is not None:
+            cursor = self.connection.execute(
+                "DELETE FROM llm_responses WHERE created_at < ?", (time.time() - self.max_age_seconds,)
+            )
+            self.evictions += cursor.rowcount
+        if self.max_size_bytes is None:
+            return
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+        if total <= self.max_size_bytes:
+            return
+        rows = self.connection.execute("SELECT key, size FROM llm_responses ORDER BY last_access").fetchall()
+        stale = []
+        for key, size in rows:
+            if total <= self.max_size_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self.connection.executemany("DELETE FROM llm_responses WHERE key = ?", stale)
+        self.evictions += len(stale)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss/eviction counters plus current entry count and size"""
+        with self._lock:
+            entries, size = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses"
+            ).fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': entries, 'size_bytes': size}
+
+    def clear(self):
+        """Remove every cached response"""
+        with self._lock:
+            self.connection.execute("DELETE FROM llm_responses")
+            self.connection.commit()
+
+    def close(self):
+        """Close the underlying SQLite connection"""
+        with self._lock:
+            self.connection.close()
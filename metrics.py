@@ -0,0 +1,152 @@
+# metrics.py
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in key) + "}"
+
+
+class Metrics:
+    """Thread-safe counters and timers with hooks and JSON / Prometheus-text export
+
+    Hooks are called as hook(event_name, value, labels) for every recorded
+    counter increment or timing, e.g. to forward events elsewhere.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.timers: Dict[str, Dict[LabelKey, Dict[str, float]]] = {}
+        self.hooks: List[Callable[[str, float, Dict], None]] = []
+        self.started_at = time.time()
+
+    def add_hook(self, hook: Callable[[str, float, Dict], None]):
+        self.hooks.append(hook)
+
+    def _emit(self, name: str, value: float, labels: Dict):
+        for hook in self.hooks:
+            try:
+                hook(name, value, labels)
+            except Exception as e:
+                print(f"Metrics hook failed: {e}")
+
+    def increment(self, name: str, amount: float = 1, **labels):
+        """Add amount to a counter"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+        self._emit(name, amount, labels)
+
+    def observe(self, name: str, seconds: float, **labels):
+        """Record one duration for a timer"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self.timers.setdefault(name, {})
+            stats = series.setdefault(key, {'count': 0, 'sum': 0.0, 'max': 0.0})
+            stats['count'] += 1
+            stats['sum'] += seconds
+            stats['max'] = max(stats['max'], seconds)
+        self._emit(name, seconds, labels)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Time the enclosed block into a timer"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> Dict:
+        """Current aggregates as a JSON-serializable dict"""
+        with self._lock:
+            return {
+                'timestamp': time.time(),
+                'uptime_seconds': time.time() - self.started_at,
+                'counters': {name: [{'labels': dict(key), 'value': value} for key, value in series.items()]
+                             for name, series in self.counters.items()},
+                'timers': {name: [{'labels': dict(key), **stats,
+                                   'mean': stats['sum'] / stats['count'] if stats['count'] else 0.0}
+                                  for key, stats in series.items()]
+                           for name, series in self.timers.items()}
+            }
+
+    def to_prometheus(self) -> str:
+        """Current aggregates in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self.timers.items()):
+                lines.append(f"# TYPE {name} summary")
+                for key, stats in series.items():
+                    labels = _format_labels(key)
+                    lines.append(f"{name}_count{labels} {stats['count']}")
+                    lines.append(f"{name}_sum{labels} {stats['sum']:.6f}")
+                lines.append(f"# TYPE {name}_max gauge")
+                for key, stats in series.items():
+                    lines.append(f"{name}_max{_format_labels(key)} {stats['max']:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def write_snapshot(self, path: str, fmt: str = 'json'):
+        """Write the current aggregates to path as 'json' or 'prometheus' text"""
+        content = self.to_prometheus() if fmt == 'prometheus' else json.dumps(self.snapshot(), indent=2)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def start_periodic_export(self, path: str, interval: float = 60.0, fmt: str = 'json') -> 'PeriodicExporter':
+        """Rewrite the snapshot file every interval seconds until the exporter is stopped"""
+        exporter = PeriodicExporter(self, path, interval, fmt)
+        exporter.start()
+        return exporter
+
+
+class PeriodicExporter(threading.Thread):
+    """Background thread writing metrics snapshots on an interval"""
+
+    def __init__(self, metrics: Metrics, path: str, interval: float, fmt: str):
+        super().__init__(daemon=True, name='metrics-exporter')
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.fmt = fmt
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.metrics.write_snapshot(self.path, self.fmt)
+
+    def stop(self):
+        """Stop the thread and write a final snapshot"""
+        self._stopped.set()
+        self.join()
+        self.metrics.write_snapshot(self.path, self.fmt)
+
+
+def timed_extractor(func: Callable) -> Callable:
+    """Record wall time of an analyzer method under extractor_seconds{extractor=<name>}"""
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self.metrics.timer('extractor_seconds', extractor=func.__name__):
+            return func(self, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,257 @@
+# migrations.py
+import json
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+# A migration step: SQL to execute, or a function run with the cursor
+Statement = Union[str, Callable[[Any], None]]
+
+
+def _column_exists(cursor, table: str, column: str) -> bool:
+    cursor.execute("SELECT COUNT(*) AS found FROM information_schema.COLUMNS "
+                   "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+                   (table, column))
+    return bool((cursor.fetchone() or {}).get("found"))
+
+
+def _index_exists(cursor, table: str, index: str) -> bool:
+    cursor.execute("SELECT COUNT(*) AS found FROM information_schema.STATISTICS "
+                   "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+                   (table, index))
+    return bool((cursor.fetchone() or {}).get("found"))
+
+
+def _add_column(table: str, column: str, definition: str) -> Callable[[Any], None]:
+    """Step adding a column unless the table already has it (e.g. created by an older release)"""
+    def step(cursor):
+        if not _column_exists(cursor, table, column):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return step
+
+
+def _add_index(table: str, index: str, definition: str) -> Callable[[Any], None]:
+    """Step adding an index or unique key unless one with this name exists"""
+    def step(cursor):
+        if not _index_exists(cursor, table, index):
+            cursor.execute(f"ALTER TABLE {table} ADD {definition}")
+    return step
+
+
+
+# Version 4 child table layout; a copy of db.CHILD_INSERT_SQL so this
+# migration keeps producing the same rows when the live schema moves on
+CHILD_BACKFILL_SQL = {
+    "profile_interest": "INSERT INTO profile_interest (profile_id, position, interest, percentage) "
+                        "VALUES (%s, %s, %s, %s)",
+    "profile_habit": "INSERT INTO profile_habit (profile_id, position, habit) VALUES (%s, %s, %s)",
+    "profile_activity": "INSERT INTO profile_activity (profile_id, position, activity) VALUES (%s, %s, %s)",
+    "profile_indicator": "INSERT INTO profile_indicator (profile_id, kind, position, indicator) "
+                         "VALUES (%s, %s, %s, %s)",
+}
+
+
+def _json_list(text) -> list:
+    """A json.dumps list column's value, or [] when it is empty or not a JSON list"""
+    try:
+        value = json.loads(text) if text else []
+    except (TypeError, ValueError):
+        return []
+    return value if isinstance(value, list) else []
+
+
+def _child_rows(profile: Dict[str, Any]) -> Dict[str, List[tuple]]:
+    """Child table rows of one user_profiles row, in CHILD_BACKFILL_SQL column order"""
+    def strings(column, length):
+        return [(profile["id"], position, str(value)[:length])
+                for position, value in enumerate(_json_list(profile[column])) if value]
+
+    return {
+        "profile_interest": [(profile["id"], position, profile[f"{ordinal}_interest"],
+                              profile[f"{ordinal}_interest_percentage"] or 0)
+                             for position, ordinal in enumerate(("first", "second", "third"))
+                             if profile[f"{ordinal}_interest"]],
+        "profile_habit": strings("top_habits", 255),
+        "profile_activity": strings("key_activities", 500),
+        "profile_indicator": ([(row[0], "life") + row[1:] for row in strings("life_indicators", 255)] +
+                              [(row[0], "spending") + row[1:] for row in strings("spending_indicators", 255)]),
+    }
+
+
+def _backfill_child_tables(cursor, batch_size: int = 1000):
+    """Copy the interests and json.dumps list columns of existing profiles into the child tables
+
+    Parsed here rather than with JSON_TABLE, which needs MySQL 8.0.4+ and
+    is missing from MariaDB before 10.6. The child tables are emptied
+    first, so a retried migration starts over instead of duplicating rows.
+    """
+    for table in CHILD_BACKFILL_SQL:
+        cursor.execute(f"DELETE FROM {table}")
+    last_id = 0
+    while True:
+        cursor.execute(
+            "SELECT id, first_interest, first_interest_percentage, second_interest, "
+            "second_interest_percentage, third_interest, third_interest_percentage, "
+            "top_habits, key_activities, life_indicators, spending_indicators "
+            "FROM user_profiles WHERE id > %s ORDER BY id LIMIT %s", (last_id, batch_size))
+        profiles = cursor.fetchall()
+        if not profiles:
+            return
+        rows: Dict[str, List[tuple]] = {table: [] for table in CHILD_BACKFILL_SQL}
+        for profile in profiles:
+            for table, table_rows in _child_rows(profile).items():
+                rows[table].extend(table_rows)
+        for table, table_rows in rows.items():
+            if table_rows:
+                cursor.executemany(CHILD_BACKFILL_SQL[table], table_rows)
+        last_id = profiles[-1]["id"]
+
+
+# (version, description, statements), applied in order and recorded in
+# schema_version. Never change what an applied migration produces; append a
+# new one. Steps must be safe to re-run: MySQL commits DDL implicitly, so a
+# migration that fails halfway is retried from its first step.
+MIGRATIONS: List[Tuple[int, str, List[Statement]]] = [
+    (1, "create user_profiles", [
+        """
+        CREATE TABLE IF NOT EXISTS user_profiles (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            first_name VARCHAR(50) NOT NULL,
+            last_name VARCHAR(50) NOT NULL,
+            age INT,
+            gender VARCHAR(20),
+            marital_status VARCHAR(50),
+            education VARCHAR(100),
+            job VARCHAR(100),
+            location VARCHAR(100),
+            first_interest VARCHAR(50),
+            first_interest_percentage INT,
+            second_interest VARCHAR(50),
+            second_interest_percentage INT,
+            third_interest VARCHAR(50),
+            third_interest_percentage INT,
+            personality_summary TEXT,
+            key_activities TEXT,
+            total_posts INT,
+            top_habits TEXT,
+            top_hobby VARCHAR(100),
+            travel_indicators VARCHAR(50),
+            life_indicators TEXT,
+            spending_indicators TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    ]),
+    (2, "natural user key and content hash", [
+        # Tables created by releases before schema_version already have these
+        _add_column("user_profiles", "user_key", "CHAR(64) NULL AFTER id"),
+        _add_column("user_profiles", "content_hash", "CHAR(64) NOT NULL DEFAULT '' AFTER user_key"),
+        _add_column("user_profiles", "updated_at",
+                    "TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"),
+        # Rows written before natural keys existed cannot be matched to a user
+        # reliably, so each keeps a unique placeholder key
+        "UPDATE user_profiles SET user_key = SHA2(CONCAT('legacy:', id), 256) WHERE user_key IS NULL",
+        "ALTER TABLE user_profiles MODIFY user_key CHAR(64) NOT NULL",
+        _add_index("user_profiles", "uq_user_profiles_user_key",
+                   "UNIQUE KEY uq_user_profiles_user_key (user_key)")
+    ]),
+    (3, "secondary indexes for read filters", [
+        _add_index("user_profiles", "idx_user_profiles_location", "INDEX idx_user_profiles_location (location)"),
+        _add_index("user_profiles", "idx_user_profiles_age", "INDEX idx_user_profiles_age (age)"),
+        _add_index("user_profiles", "idx_user_profiles_first_interest",
+                   "INDEX idx_user_profiles_first_interest (first_interest)"),
+        _add_index("user_profiles", "idx_user_profiles_created_at",
+                   "INDEX idx_user_profiles_created_at (created_at)")
+    ]),
+    (4, "normalized interest, habit, activity and indicator tables", [
+        """
+        CREATE TABLE IF NOT EXISTS profile_interest (
+            profile_id INT NOT NULL,
+            position TINYINT NOT NULL,
+            interest VARCHAR(50) NOT NULL,
+            percentage INT NOT NULL,
+            PRIMARY KEY (profile_id, position),
+            INDEX idx_profile_interest_interest (interest, percentage),
+            FOREIGN KEY (profile_id) REFERENCES user_profiles (id) ON DELETE CASCADE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS profile_habit (
+            profile_id INT NOT NULL,
+            position TINYINT NOT NULL,
+            habit VARCHAR(255) NOT NULL,
+            PRIMARY KEY (profile_id, position),
+            INDEX idx_profile_habit_habit (habit),
+            FOREIGN KEY (profile_id) REFERENCES user_profiles (id) ON DELETE CASCADE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS profile_activity (
+            profile_id INT NOT NULL,
+            position TINYINT NOT NULL,
+            activity VARCHAR(500) NOT NULL,
+            PRIMARY KEY (profile_id, position),
+            INDEX idx_profile_activity_activity (activity(191)),
+            FOREIGN KEY (profile_id) REFERENCES user_profiles (id) ON DELETE CASCADE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS profile_indicator (
+            profile_id INT NOT NULL,
+            kind ENUM('life', 'spending') NOT NULL,
+            position TINYINT NOT NULL,
+            indicator VARCHAR(255) NOT NULL,
+            PRIMARY KEY (profile_id, kind, position),
+            INDEX idx_profile_indicator_kind_indicator (kind, indicator),
+            FOREIGN KEY (profile_id) REFERENCES user_profiles (id) ON DELETE CASCADE
+        )
+        """,
+        _backfill_child_tables,
+    ]),
+]
+
+SCHEMA_VERSION_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        description VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+LOCK_NAME = "user_profiles_schema_migration"
+
+
+def current_version(cursor) -> int:
+    cursor.execute("SELECT MAX(version) AS version FROM schema_version")
+    row = cursor.fetchone()
+    return (row or {}).get("version") or 0
+
+
+def run_migrations(connection, lock_timeout: int = 60) -> int:
+    """Apply pending MIGRATIONS on connection and return the resulting schema version
+
+    A named server lock keeps concurrently starting processes from applying
+    the same migration twice. MySQL commits DDL implicitly, so each
+    migration's version row is committed right after its statements.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT GET_LOCK(%s, %s) AS acquired", (LOCK_NAME, lock_timeout))
+        if not (cursor.fetchone() or {}).get("acquired"):
+            raise RuntimeError(f"Could not acquire the schema migration lock within {lock_timeout}s")
+        try:
+            cursor.execute(SCHEMA_VERSION_SQL)
+            version = current_version(cursor)
+            for target, description, statements in MIGRATIONS:
+                if target <= version:
+                    continue
+                print(f" Applying schema migration {target}: {description}")
+                for statement in statements:
+                    if callable(statement):
+                        statement(cursor)
+                    else:
+                        cursor.execute(statement)
+                cursor.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                               (target, description))
+                connection.commit()
+                version = target
+            return version
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
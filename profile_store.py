@@ -0,0 +1,206 @@
+# profile_store.py
+import json
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from analyzer import UserProfile, profile_from_dict, profile_to_dict
+
+AGE_UNKNOWN = -1
+
+
+class CategoryCodes:
+    """Interns a categorical string column as small integer codes"""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+
+    def encode(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(sys.intern(value) if isinstance(value, str) else value)
+        return code
+
+    def decode(self, code: int) -> str:
+        return self.values[code]
+
+
+class ProfileStore:
+    """Memory-lean, column-oriented container of analyzed profiles
+
+    Categorical fields (gender, marital status, location, travel frequency
+    and interest names) are stored as integer codes, numeric fields and
+    interest percentages in typed arrays, free-text lists as tuples of
+    interned strings. Profiles are rebuilt on access, so iteration, indexing
+    and lookups return ordinary UserProfile objects.
+    """
+
+    MAX_INTERESTS = 3
+
+    def __init__(self, profiles: Iterable[UserProfile] = ()):
+        self.genders = CategoryCodes()
+        self.marital_statuses = CategoryCodes()
+        self.locations = CategoryCodes()
+        self.travel_frequencies = CategoryCodes()
+        self.interests = CategoryCodes()
+
+        self._gender = array('H')
+        self._marital_status = array('H')
+        self._location = array('I')
+        self._travel_frequency = array('B')
+        self._age = array('h')
+        self._age_other: Dict[int, object] = {}
+        self._total_posts = array('I')
+        self._interest_count = array('B')
+        self._interest_codes = array('I')
+        self._interest_percentages = array('h')
+
+        self._first_name: List[str] = []
+        self._last_name: List[str] = []
+        self._education: List[str] = []
+        self._job: List[str] = []
+        self._personality_summary: List[str] = []
+        self._top_hobby: List[str] = []
+        self._fingerprint: List[str] = []
+        self._user_key: List[str] = []
+        self._key_activities: List[tuple] = []
+        self._top_habits: List[tuple] = []
+        self._life_indicators: List[tuple] = []
+        self._spending_indicators: List[tuple] = []
+
+        self._by_name: Dict[tuple, List[int]] = {}
+        self._by_fingerprint: Dict[str, int] = {}
+        self.extend(profiles)
+
+    @staticmethod
+    def _interned(values: Iterable[str]) -> tuple:
+        return tuple(sys.intern(v) if isinstance(v, str) else v for v in values)
+
+    def append(self, profile: UserProfile):
+        """Add one profile to the store"""
+        index = len(self._first_name)
+        self._gender.append(self.genders.encode(profile.gender))
+        self._marital_status.append(self.marital_statuses.encode(profile.marital_status))
+        self._location.append(self.locations.encode(profile.location))
+        self._travel_frequency.append(self.travel_frequencies.encode(profile.travel_frequency))
+
+        if isinstance(profile.age, int) and 0 <= profile.age < 2 ** 15:
+            self._age.append(profile.age)
+        else:
+            self._age.append(AGE_UNKNOWN)
+            self._age_other[index] = profile.age
+        self._total_posts.append(profile.total_posts)
+
+        interests = profile.top_interests[:self.MAX_INTERESTS]
+        self._interest_count.append(len(interests))
+        for slot in range(self.MAX_INTERESTS):
+            if slot < len(interests):
+                self._interest_codes.append(self.interests.encode(interests[slot]['interest']))
+                self._interest_percentages.append(int(interests[slot]['percentage']))
+            else:
+                self._interest_codes.append(0)
+                self._interest_percentages.append(0)
+
+        self._first_name.append(sys.intern(profile.first_name))
+        self._last_name.append(sys.intern(profile.last_name))
+        self._education.append(sys.intern(profile.education) if isinstance(profile.education, str) else profile.education)
+        self._job.append(sys.intern(profile.job) if isinstance(profile.job, str) else profile.job)
+        self._personality_summary.append(profile.personality_summary)
+        self._top_hobby.append(sys.intern(profile.top_hobby))
+        self._fingerprint.append(profile.fingerprint)
+        self._user_key.append(profile.user_key)
+        self._key_activities.append(tuple(profile.key_activities))
+        self._top_habits.append(self._interned(profile.top_habits))
+        self._life_indicators.append(self._interned(profile.life_indicators))
+        self._spending_indicators.append(self._interned(profile.spending_indicators))
+
+        self._by_name.setdefault((profile.first_name, profile.last_name), []).append(index)
+        if profile.fingerprint:
+            self._by_fingerprint[profile.fingerprint] = index
+
+    def extend(self, profiles: Iterable[UserProfile]):
+        """Add many profiles, consuming the iterable lazily"""
+        for profile in profiles:
+            self.append(profile)
+
+    def __len__(self) -> int:
+        return len(self._first_name)
+
+    def __getitem__(self, index: int) -> UserProfile:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ProfileStore index out of range")
+
+        base = index * self.MAX_INTERESTS
+        top_interests = [
+            {'interest': self.interests.decode(self._interest_codes[base + slot]),
+             'percentage': self._interest_percentages[base + slot]}
+            for slot in range(self._interest_count[index])
+        ]
+        age = self._age[index]
+        return UserProfile(
+            first_name=self._first_name[index],
+            last_name=self._last_name[index],
+            age=self._age_other[index] if age == AGE_UNKNOWN else age,
+            gender=self.genders.decode(self._gender[index]),
+            marital_status=self.marital_statuses.decode(self._marital_status[index]),
+            education=self._education[index],
+            job=self._job[index],
+            location=self.locations.decode(self._location[index]),
+            top_interests=top_interests,
+            personality_summary=self._personality_summary[index],
+            key_activities=list(self._key_activities[index]),
+            total_posts=self._total_posts[index],
+            top_habits=list(self._top_habits[index]),
+            top_hobby=self._top_hobby[index],
+            travel_frequency=self.travel_frequencies.decode(self._travel_frequency[index]),
+            life_indicators=list(self._life_indicators[index]),
+            spending_indicators=list(self._spending_indicators[index]),
+            fingerprint=self._fingerprint[index],
+            user_key=self._user_key[index]
+        )
+
+    def __iter__(self) -> Iterator[UserProfile]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def find_by_name(self, first_name: str, last_name: str = "") -> List[UserProfile]:
+        """All stored profiles with this first and last name"""
+        return [self[i] for i in self._by_name.get((first_name, last_name), [])]
+
+    def find_by_fingerprint(self, fingerprint: str) -> Optional[UserProfile]:
+        """The stored profile analyzed from the input with this fingerprint, if any"""
+        index = self._by_fingerprint.get(fingerprint)
+        return None if index is None else self[index]
+
+    def location_counts(self) -> Dict[str, int]:
+        """Number of profiles per location, computed from the code column"""
+        counts = [0] * len(self.locations.values)
+        for code in self._location:
+            counts[code] += 1
+        return dict(zip(self.locations.values, counts))
+
+    def to_records(self) -> Iterator[Dict]:
+        """Profiles in the output-file layout"""
+        for profile in self:
+            yield profile_to_dict(profile)
+
+    def save_jsonl(self, path: str):
+        """Write the store as one JSON record per line"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for record in self.to_records():
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    @classmethod
+    def load_jsonl(cls, path: str) -> 'ProfileStore':
+        """Build a store from a JSONL file written by save_jsonl (or a checkpoint)"""
+        def records():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        yield profile_from_dict(json.loads(line))
+        return cls(records())
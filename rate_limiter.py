@@ -0,0 +1,157 @@
+# rate_limiter.py
+import random
+import re
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+try:
+    from google.api_core import exceptions as google_exceptions
+    RETRYABLE_EXCEPTIONS = (
+        google_exceptions.TooManyRequests,
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.DeadlineExceeded,
+    )
+    TYPED_API_ERRORS = (google_exceptions.GoogleAPICallError,)
+except ImportError:
+    RETRYABLE_EXCEPTIONS = ()
+    TYPED_API_ERRORS = ()
+
+RETRYABLE_MARKERS = ("quota", "rate limit", "resource exhausted",
+                     "unavailable", "deadline exceeded", "timed out")
+# HTTP status codes only count as whole numbers, not digits inside e.g. "1500 tokens"
+RETRYABLE_STATUS = re.compile(r'\b(429|500|503)\b')
+
+T = TypeVar("T")
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Return True for throttling / transient server errors worth retrying"""
+    if RETRYABLE_EXCEPTIONS and isinstance(error, RETRYABLE_EXCEPTIONS):
+        return True
+    if TYPED_API_ERRORS and isinstance(error, TYPED_API_ERRORS):
+        # Typed API errors carry their status; only the classes above are transient
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    message = str(error).lower()
+    return bool(RETRYABLE_STATUS.search(message)) or any(marker in message for marker in RETRYABLE_MARKERS)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate` units per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available (0 if available now)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Shared requests/minute and tokens/minute limiter with adaptive throttling
+
+    When the API reports throttling the effective rate is halved (down to
+    min_fraction of the configured rate); every success restores it gradually.
+    Either limit may be None to disable it.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 min_fraction: float = 0.1, recovery_step: float = 0.05):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.min_fraction = min_fraction
+        self.recovery_step = recovery_step
+        self.fraction = 1.0
+        self._lock = threading.Lock()
+        self._request_bucket = (TokenBucket(requests_per_minute / 60.0, max(1.0, requests_per_minute / 60.0))
+                                if requests_per_minute else None)
+        self._token_bucket = (TokenBucket(tokens_per_minute / 60.0, tokens_per_minute / 60.0 * 5)
+                              if tokens_per_minute else None)
+
+    def acquire(self, tokens: int = 1):
+        """Block until one request carrying `tokens` input tokens may be sent"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = 0.0
+                if self._request_bucket:
+                    wait = max(wait, self._request_bucket.wait_time(1, now))
+                if self._token_bucket:
+                    wait = max(wait, self._token_bucket.wait_time(tokens, now))
+                if wait <= 0:
+                    if self._request_bucket:
+                        self._request_bucket.consume(1)
+                    if self._token_bucket:
+                        self._token_bucket.consume(tokens)
+                    return
+            time.sleep(wait)
+
+    def _apply_fraction(self):
+        if self._request_bucket:
+            self._request_bucket.rate = self.requests_per_minute / 60.0 * self.fraction
+        if self._token_bucket:
+            self._token_bucket.rate = self.tokens_per_minute / 60.0 * self.fraction
+
+    def record_throttle(self):
+        """Slow down after a throttling / transient error"""
+        with self._lock:
+            self.fraction = max(self.min_fraction, self.fraction / 2)
+            self._apply_fraction()
+
+    def record_success(self):
+        """Gradually restore the configured rate after a successful call"""
+        with self._lock:
+            if self.fraction < 1.0:
+                self.fraction = min(1.0, self.fraction + self.recovery_step)
+                self._apply_fraction()
+
+
+def backoff_delay(attempt: int, base_delay: float = 1.0, max_delay: float = 60.0) -> float:
+    """Full-jitter exponential backoff delay for a zero-based retry attempt"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def call_with_retries(func: Callable[[], T], max_retries: int = 3,
+                      base_delay: float = 1.0, max_delay: float = 60.0,
+                      limiter: Optional[RateLimiter] = None,
+                      on_retry: Optional[Callable[[int, Exception], None]] = None) -> T:
+    """Call func, retrying retryable errors with jittered exponential backoff
+
+    Non-retryable errors and the last retryable error are re-raised.
+    """
+    attempt = 0
+    while True:
+        try:
+            result = func()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable_error(e):
+                raise
+            if limiter:
+                limiter.record_throttle()
+            if on_retry:
+                on_retry(attempt, e)
+            time.sleep(backoff_delay(attempt, base_delay, max_delay))
+            attempt += 1
+            continue
+        if limiter:
+            limiter.record_success()
+        return result
@@ -0,0 +1,107 @@
+# sharding.py
+import hashlib
+import heapq
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from analyzer import LLMUserProfileAnalyzer, UserProfile, profile_from_dict, profile_to_dict, read_users
+from checkpoint import CheckpointWriter, read_checkpoint
+
+
+def shard_for(user_name: str, shards: int) -> int:
+    """Stable shard number of a user, the same in every process and run"""
+    digest = hashlib.sha256(str(user_name).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shards
+
+
+def shard_paths(work_dir: str, shard: int) -> tuple:
+    """(input, output) JSONL paths of one shard"""
+    return (os.path.join(work_dir, f"shard-{shard:03d}.input.jsonl"),
+            os.path.join(work_dir, f"shard-{shard:03d}.profiles.jsonl"))
+
+
+def partition_users(users: Iterable[Dict], work_dir: str, shards: int) -> List[int]:
+    """Stream users into per-shard input files by hash of UserName
+
+    Every line holds the user's position in the input next to the record.
+    Returns the number of users written to each shard.
+    """
+    files = [open(shard_paths(work_dir, shard)[0], 'w', encoding='utf-8') for shard in range(shards)]
+    counts = [0] * shards
+    try:
+        for index, user in enumerate(users):
+            shard = shard_for(user.get('UserName', ''), shards)
+            files[shard].write(json.dumps({'index': index, 'user': user}, ensure_ascii=False) + '\n')
+            counts[shard] += 1
+    finally:
+        for f in files:
+            f.close()
+    return counts
+
+
+def _run_shard(input_path: str, output_path: str, analyzer_kwargs: Dict,
+               max_workers: Optional[int], previous_profiles: Optional[List[UserProfile]]) -> int:
+    """Worker process: analyze one input shard into its output shard, returns profiles written"""
+    analyzer = LLMUserProfileAnalyzer(**analyzer_kwargs)
+    indices = []
+
+    def users() -> Iterator[Dict]:
+        with open(input_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                indices.append(record['index'])
+                yield record['user']
+
+    written = 0
+    with CheckpointWriter(output_path, fsync_every=0) as writer:
+        for local_index, profile in analyzer._iter_indexed_results(users(), max_workers, previous_profiles):
+            if profile is not None:
+                writer.write({'index': indices[local_index], **profile_to_dict(profile)})
+                written += 1
+    return written
+
+
+def merge_shards(output_paths: List[str]) -> Iterator[UserProfile]:
+    """Merge per-shard outputs (each in input order) back into one input-ordered stream"""
+    streams = [read_checkpoint(path)[0] for path in output_paths]
+    for record in heapq.merge(*streams, key=lambda r: r['index']):
+        yield profile_from_dict(record)
+
+
+def analyze_all_users_sharded(users: Union[str, Iterable[Dict]], processes: int,
+                              analyzer_kwargs: Optional[Dict] = None, work_dir: Optional[str] = None,
+                              max_workers: Optional[int] = None,
+                              previous_profiles: Optional[List[UserProfile]] = None) -> List[UserProfile]:
+    """Analyze users on a pool of processes, one shard of users per process
+
+    Users (a file path or an iterable of user dicts) are partitioned by hash
+    of UserName into one shard per process. Each worker builds its own
+    LLMUserProfileAnalyzer(**analyzer_kwargs), so its own model client, and
+    analyzes its shard with max_workers threads into its own output shard.
+    The shards are merged back so the result matches analyze_all_users.
+    analyzer_kwargs must be picklable (e.g. no LLMCache instance; pass a
+    backend or api_key). Shard files are kept in work_dir when it is given.
+    """
+    analyzer_kwargs = analyzer_kwargs or {}
+    processes = max(1, processes)
+    if isinstance(users, str):
+        users = read_users(users)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = work_dir or tmp
+        os.makedirs(work_dir, exist_ok=True)
+        counts = partition_users(users, work_dir, processes)
+        print(f"Partitioned {sum(counts)} users into {processes} shards: {counts}")
+
+        paths = [shard_paths(work_dir, shard) for shard in range(processes)]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [executor.submit(_run_shard, input_path, output_path, analyzer_kwargs,
+                                       max_workers, previous_profiles)
+                       for input_path, output_path in paths]
+            for shard, future in enumerate(futures):
+                print(f"Shard {shard}: {future.result()} profiles")
+
+        return list(merge_shards([output_path for _, output_path in paths]))
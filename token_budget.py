@@ -0,0 +1,100 @@
+# token_budget.py
+import re
+from typing import List, Optional
+
+from keyword_scanner import KeywordScanner
+
+POST_SELECTION_STRATEGIES = ('recent', 'keyword_dense', 'stratified')
+
+ARABIC_LETTERS = re.compile(r'[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF]')
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast local token estimate: ~4 ASCII characters or ~2.5 non-ASCII
+    (e.g. Arabic) characters per token"""
+    if not text:
+        return 0
+    non_ascii = len(text) - len(text.encode('ascii', 'ignore'))
+    ascii_chars = len(text) - non_ascii
+    return max(1, int(ascii_chars / 4 + non_ascii / 2.5 + 0.5))
+
+
+def post_language(post: str) -> str:
+    """'arabic' when most letters are Arabic, otherwise 'latin'"""
+    arabic = len(ARABIC_LETTERS.findall(post))
+    letters = sum(1 for c in post if c.isalpha())
+    return 'arabic' if letters and arabic * 2 >= letters else 'latin'
+
+
+def truncate_to_budget(text: str, budget: int) -> str:
+    """Cut text so that its estimated token count fits budget"""
+    if estimate_tokens(text) <= budget:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
+
+
+def _take_by_priority(costs: List[int], priority: List[int], budget: int) -> List[int]:
+    """Greedily take post indices in priority order while they fit the budget"""
+    chosen, used = [], 0
+    for i in priority:
+        if used + costs[i] <= budget:
+            chosen.append(i)
+            used += costs[i]
+    return chosen
+
+
+def select_posts(posts: List[str], budget: Optional[int], strategy: str = 'recent',
+                 keyword_scanner: Optional[KeywordScanner] = None) -> List[str]:
+    """Deterministically choose the posts to paste into a prompt under a token budget
+
+    Posts are assumed to be in chronological order (last = most recent); the
+    selection keeps their original order. Strategies:
+    - 'recent': most recent posts first
+    - 'keyword_dense': posts with the most keyword-scanner hits per token first
+    - 'stratified': budget split across Arabic and Latin-script posts in
+      proportion to their share of the user's tokens, most recent first in each
+    If not even one post fits, the most recent post is truncated to the budget.
+    """
+    if strategy not in POST_SELECTION_STRATEGIES:
+        raise ValueError(f"Unknown post selection strategy: {strategy}")
+    # Posts are joined with single spaces, roughly one token each
+    costs = [estimate_tokens(post) + 1 for post in posts]
+    if budget is None or sum(costs) <= budget:
+        return list(posts)
+
+    recent_first = list(range(len(posts) - 1, -1, -1))
+    if strategy == 'recent':
+        chosen = _take_by_priority(costs, recent_first, budget)
+    elif strategy == 'keyword_dense':
+        if keyword_scanner is None:
+            raise ValueError("keyword_dense selection needs a keyword scanner")
+        density = [sum(keyword_scanner.count_keywords(post).values()) / costs[i]
+                   for i, post in enumerate(posts)]
+        priority = sorted(recent_first, key=lambda i: -density[i])
+        chosen = _take_by_priority(costs, priority, budget)
+    else:
+        strata = {}
+        for i in recent_first:
+            strata.setdefault(post_language(posts[i]), []).append(i)
+        total = sum(costs)
+        chosen = []
+        for language in sorted(strata):
+            indices = strata[language]
+            share = budget * sum(costs[i] for i in indices) // total
+            chosen.extend(_take_by_priority(costs, indices, share))
+        # Spend what proportional rounding left over on the most recent remaining posts
+        used = sum(costs[i] for i in chosen)
+        taken = set(chosen)
+        remaining = [i for i in recent_first if i not in taken]
+        chosen.extend(_take_by_priority(costs, remaining, budget - used))
+
+    if not chosen:
+        return [truncate_to_budget(posts[-1], max(0, budget - 1))] if posts else []
+    return [posts[i] for i in sorted(chosen)]
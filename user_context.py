@@ -0,0 +1,106 @@
+# user_context.py
+import hashlib
+import json
+from functools import cached_property
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+from keyword_scanner import KeywordScanner
+from token_budget import estimate_tokens, select_posts
+
+# Source record fields holding a user id, checked in order
+SOURCE_ID_FIELDS = ('UserId', 'UserID', 'user_id', 'id')
+
+
+def source_user_key(user: Mapping) -> str:
+    """Stable identity of a source user record, independent of its demographics
+
+    Uses the record's own id when the source provides one (SOURCE_ID_FIELDS),
+    else its normalized UserName, so the key survives edits to age, job or
+    posts.
+    """
+    source_id = next((user.get(field) for field in SOURCE_ID_FIELDS
+                      if user.get(field) not in (None, '')), None)
+    if source_id is not None:
+        identity = f"id:{source_id}"
+    else:
+        name = user.get('UserName') or user.get('FullName') or ''
+        identity = "name:" + ' '.join(str(name).split()).lower()
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+class UserContext:
+    """Immutable per-user analysis context shared by all extractors
+
+    Holds the raw user record plus derived values (joined posts text,
+    lowercased posts, token estimate, keyword statistics, fingerprint) that
+    are computed lazily on first access and then memoized. prompt_posts_text
+    is the posts text to paste into prompts, limited to prompt_token_budget
+    estimated tokens using the post_selection strategy. keyword_counts may be
+    passed in when already computed, e.g. by columnar.CorpusFeatures.
+    """
+
+    def __init__(self, user: Dict, keyword_scanner: KeywordScanner,
+                 prompt_token_budget: Optional[int] = None, post_selection: str = 'recent',
+                 keyword_counts: Optional[Dict[str, Dict[str, int]]] = None):
+        object.__setattr__(self, 'user', MappingProxyType(user))
+        object.__setattr__(self, 'posts', tuple(user.get('Posts', [])))
+        object.__setattr__(self, 'keyword_scanner', keyword_scanner)
+        object.__setattr__(self, 'prompt_token_budget', prompt_token_budget)
+        object.__setattr__(self, 'post_selection', post_selection)
+        if keyword_counts is not None:
+            # Pre-populate the cached_property slot
+            self.__dict__['keyword_counts'] = self._freeze_counts(keyword_counts)
+
+    @staticmethod
+    def _freeze_counts(counts: Dict[str, Dict[str, int]]) -> Mapping[str, Mapping[str, int]]:
+        return MappingProxyType({group: MappingProxyType(dict(categories)) for group, categories in counts.items()})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("UserContext is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("UserContext is immutable")
+
+    def get(self, key: str, default=None):
+        """Field of the underlying user record"""
+        return self.user.get(key, default)
+
+    @cached_property
+    def posts_text(self) -> str:
+        return ' '.join(self.posts)
+
+    @cached_property
+    def posts_text_lower(self) -> str:
+        return self.posts_text.lower()
+
+    @cached_property
+    def lower_posts(self) -> Tuple[str, ...]:
+        return tuple(post.lower() for post in self.posts)
+
+    @cached_property
+    def token_estimate(self) -> int:
+        return estimate_tokens(self.posts_text)
+
+    @cached_property
+    def prompt_posts(self) -> Tuple[str, ...]:
+        if self.prompt_token_budget is None or self.token_estimate <= self.prompt_token_budget:
+            return self.posts
+        return tuple(select_posts(list(self.posts), self.prompt_token_budget,
+                                  self.post_selection, self.keyword_scanner))
+
+    @cached_property
+    def prompt_posts_text(self) -> str:
+        if self.prompt_posts is self.posts:
+            return self.posts_text
+        return ' '.join(self.prompt_posts)
+
+    @cached_property
+    def keyword_counts(self) -> Mapping[str, Mapping[str, int]]:
+        """Group -> category -> keyword hits over all posts (one scan per post)"""
+        return self._freeze_counts(self.keyword_scanner.category_counts(self.lower_posts, lowered=True))
+
+    @cached_property
+    def fingerprint(self) -> str:
+        canonical = json.dumps(dict(self.user), sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()